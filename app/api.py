@@ -16,7 +16,12 @@ import uvicorn
 from sqlmodel import Session, select
 from models.user import User
 from models.item import Item
-from database.database import get_database_engine
+from database.database import get_database_engine, dispose_async_engine
+from services.recsys.online import get_online_recommender
+from services.rm.result_consumer import result_consumer
+from services.rm.rm import rabbit_client
+from services.recsys.embedding_updater import embedding_updater
+from services.recsys.interaction_buffer import interaction_buffer
 import subprocess
 
 
@@ -68,6 +73,23 @@ def on_startup():
         init_db(drop_all=True)
         logger.info("Запуск приложения успешно завершен")
 
+        # Результаты воркеров приходят через очередь RabbitMQ
+        result_consumer.start()
+        # Эмбеддинги пользователей пересчитываются в фоне по событиям лайков
+        embedding_updater.start()
+        if settings.LIKE_BUFFER_ENABLED:
+            interaction_buffer.start()
+
+        # Прогреваем синхронные рекомендации: веса модели и матрица товаров.
+        # Экспорт .npz пишет воркер после старта, поэтому без него API работает
+        # дальше: /now отвечает 503, пока веса не появятся
+        try:
+            recommender = get_online_recommender()
+            with Session(get_database_engine()) as session:
+                recommender.catalog.refresh(session, force=True)
+        except Exception as e:
+            logger.warning(f"Синхронные рекомендации недоступны: {e}")
+
         # 💡 Проверка наличия данных сразу после запуска
         engine = get_database_engine()
         with Session(engine) as session:
@@ -88,6 +110,12 @@ def on_startup():
 async def shutdown_event():
     """Очистка при завершении работы приложения."""
     logger.info("Завершение работы приложения...")
+    result_consumer.stop()
+    # Буфер лайков записывается до остановки пересчёта эмбеддингов
+    interaction_buffer.stop()
+    embedding_updater.stop()
+    rabbit_client.close()
+    await dispose_async_engine()
 
 if __name__ == '__main__':
     uvicorn.run(
@@ -1,11 +1,34 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
-# Создаем контекст с использованием bcrypt алгоритма
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from database.config import get_settings
+
+
+settings = get_settings()
+
+# Создаем контекст с использованием bcrypt алгоритма.
+# Хеши с другим числом раундов считаются устаревшими и перехешируются при входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_HASH_ROUNDS,
+    bcrypt__max_rounds=settings.PASSWORD_HASH_ROUNDS
+)
+
+# bcrypt отпускает GIL, поэтому хеши считаются параллельно в ограниченном пуле потоков,
+# не занимая event loop
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 class HashPassword:
     """
     Класс для хеширования и верификации паролей с использованием bcrypt.
+
+    Async-методы выполняют bcrypt в пуле потоков: из async-маршрутов
+    следует вызывать их, а не синхронные.
     """
     
     def create_hash(self, password: str) -> str:
@@ -31,4 +54,20 @@ class HashPassword:
         Returns:
             bool: True если пароль соответствует хешу, False в противном случае
         """
-        return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+        return pwd_context.verify(plain_password, hashed_password)
+
+    async def create_hash_async(self, password: str) -> str:
+        """Создает хеш пароля в пуле потоков хеширования."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, self.create_hash, password)
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Проверяет пароль в пуле потоков хеширования.
+
+        Returns:
+            Tuple[bool, Optional[str]]: Результат проверки и новый хеш,
+            если пароль верен, а хеш посчитан с устаревшими параметрами (иначе None)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, pwd_context.verify_and_update, plain_password, hashed_password)
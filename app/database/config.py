@@ -9,8 +9,12 @@ class Settings(BaseSettings):
     DB_USER: Optional[str] = None    # Имя пользователя БД
     DB_PASS: Optional[str] = None    # Пароль пользователя БД
     DB_NAME: Optional[str] = None    # Название базы данных
+    DB_ASYNC_POOL_SIZE: int = 10     # Пул соединений асинхронного движка (asyncpg)
+    DB_ASYNC_MAX_OVERFLOW: int = 20  # Дополнительные соединения асинхронного движка сверх пула
     COOKIE_NAME: Optional[str] = None # Название cookie
     SECRET_KEY: Optional[str] = None  # Секретный ключ
+    PASSWORD_HASH_ROUNDS: int = 12   # Work factor bcrypt (хеши с другим значением перехешируются при входе)
+    PASSWORD_HASH_WORKERS: int = 4   # Потоков для хеширования паролей
     
     # Настройки приложения
     APP_NAME: Optional[str] = None        # Название приложения
@@ -20,6 +24,62 @@ class Settings(BaseSettings):
 
     DATA_FILE_ID: Optional[str] = None      # ID файла с данными
     MODEL_FILE_ID: Optional[str] = None     # ID модели
+    MODEL_PATH: str = "ml_models/contrastive_rating_best.pth"  # Чекпоинт модели (веса user_projection)
+    MODEL_WEIGHTS_PATH: str = "ml_models/user_projection.npz"  # Экспорт user_projection для инференса без torch
+
+    EMBEDDING_DTYPE: str = "float32"        # Формат хранения эмбеддингов: float32 или float16
+
+    # Настройки ML-воркера
+    CATALOG_REFRESH_SECONDS: int = 60       # Период проверки версии каталога товаров
+    POPULAR_TOP_K: int = 1000               # Размер списка популярных товаров в памяти (fallback без эмбеддинга)
+    POPULAR_QUERY_CACHE_SIZE: int = 10000   # Сколько поисковых запросов хранит кэш популярных товаров
+    POPULAR_REFRESH_SECONDS: int = 60       # Период проверки изменения popularity_score
+    INDEX_TYPE: str = "flat"                # Тип FAISS-индекса: flat, ivf или hnsw
+    INDEX_PATH: str = "ml_models/items.faiss"  # Путь к сохранённому индексу
+    INDEX_IVF_NLIST: int = 1024             # Количество кластеров IVF
+    INDEX_IVF_NPROBE: int = 16              # Просматриваемые кластеры IVF при поиске
+    INDEX_HNSW_M: int = 32                  # Связность графа HNSW
+    INDEX_HNSW_EF_CONSTRUCTION: int = 200   # Ширина поиска при построении HNSW
+    INDEX_HNSW_EF_SEARCH: int = 64          # Ширина поиска HNSW при запросе
+    FILTER_EXACT_MAX_CANDIDATES: int = 20000  # До этого числа кандидатов фильтр скорится точно по матрице
+    SEARCH_MAX_CANDIDATES: int = 10000      # Максимум кандидатов полнотекстового поиска на запрос
+    SEARCH_BACKEND: str = "bm25"            # Поиск в воркере: bm25 (в памяти) или sql (Postgres FTS)
+    SEARCH_HYBRID_ALPHA: float = 0.5        # Вес BM25 в гибридном скоре (1 - вес векторного скора)
+    QUERY_CACHE_MAX_ENTRIES: int = 10000    # Кэш кандидатов поисковых запросов воркера (общий для всех пользователей)
+    QUERY_CACHE_TTL_SECONDS: int = 600      # Время жизни кандидатов запроса в кэше
+    RERANK_ENABLED: bool = False            # Двухэтапное ранжирование: поиск кандидатов, затем переоценка
+    RERANK_CANDIDATES: int = 500            # Кандидатов первого этапа на задачу
+    RERANK_BUDGET_MS: float = 20.0          # Бюджет времени на батч, после него переоценка пропускается
+    RERANK_POPULARITY_WEIGHT: float = 0.1   # Вес популярности при переоценке (вес скалярного произведения — 1)
+    RERANK_LEXICAL_WEIGHT: float = 0.3      # Вес BM25-скора при переоценке
+    WORKER_BATCH_SIZE: int = 1              # Размер микро-батча задач воркера (1 — без батчинга)
+    WORKER_BATCH_TIMEOUT_MS: int = 50       # Максимальное ожидание добора батча, мс
+    WORKER_PREFETCH_COUNT: int = 0          # Лимит неподтверждённых сообщений на воркер (0 — batch_size * concurrency)
+    WORKER_CONCURRENCY: int = 1             # Потоков обработки задач в воркере
+    WORKER_PROCESSES: int = 1               # Процессов-консьюмеров под супервизором (1 — без супервизора)
+    CATALOG_SHARED_DIR: str = "ml_models/catalog"  # Общий снимок каталога для процессов супервизора
+
+    # Публикация задач в RabbitMQ
+    RABBITMQ_POOL_SIZE: int = 4             # Максимум долгоживущих соединений публикатора
+    RABBITMQ_PUBLISH_CONFIRMS: bool = True  # Ждать подтверждения брокера для каждой задачи
+
+    # Приём результатов воркеров из очереди RabbitMQ
+    RESULT_BATCH_SIZE: int = 100            # Максимум результатов, записываемых в БД одним коммитом
+    RESULT_BATCH_TIMEOUT_MS: int = 100      # Максимальное ожидание добора пачки результатов, мс
+
+    # Фоновый пересчёт эмбеддингов пользователей по лайкам
+    EMBEDDING_UPDATE_WINDOW_MS: int = 200   # Окно накопления лайков перед пересчётом, мс
+    EMBEDDING_UPDATE_MAX_BATCH: int = 1000  # Максимум событий лайков в одной пачке
+
+    # Приём взаимодействий
+    INTERACTION_BULK_MAX_ROWS: int = 50000  # Максимум строк в одном запросе массовой загрузки
+    LIKE_BUFFER_ENABLED: bool = False       # Копить одиночные лайки в памяти и записывать пачками
+    LIKE_BUFFER_FLUSH_MS: int = 500         # Период записи буфера лайков, мс
+    LIKE_BUFFER_MAX_ROWS: int = 5000        # Размер буфера, при котором запись начинается досрочно
+
+    # Кэш рекомендаций API
+    RECS_CACHE_TTL_SECONDS: int = 300       # Время жизни закэшированных рекомендаций
+    RECS_CACHE_MAX_ENTRIES: int = 10000     # Максимум записей кэша (вытесняются давно не использованные)
     
     @property
     def DATABASE_URL_asyncpg(self):
@@ -1,5 +1,7 @@
 from sqlmodel import SQLModel, Session, create_engine 
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from typing import Optional
 from database.config import get_settings
 
@@ -30,3 +32,42 @@ def get_session():
     # Создание сессии базы данных
     with Session(engine) as session:
         yield session
+
+
+def get_async_database_engine() -> AsyncEngine:
+    """
+    Создание асинхронного движка SQLAlchemy (asyncpg) для async-маршрутов.
+
+    Возвращает:
+        AsyncEngine: Настроенный асинхронный движок
+    """
+    settings = get_settings()
+
+    return create_async_engine(
+        url=settings.DATABASE_URL_asyncpg,
+        echo=settings.DEBUG,
+        pool_size=settings.DB_ASYNC_POOL_SIZE,
+        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=3600
+    )
+
+# Асинхронный движок создаётся при первом обращении: модуль импортирует и ML-воркер,
+# в котором asyncpg не установлен
+_async_engine: Optional[AsyncEngine] = None
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = get_async_database_engine()
+    return _async_engine
+
+async def dispose_async_engine() -> None:
+    """Закрывает соединения асинхронного движка, если он был создан."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+async def get_async_session():
+    # Объекты остаются доступны после commit без повторной загрузки (ленивые загрузки в async недоступны)
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
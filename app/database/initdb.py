@@ -1,13 +1,18 @@
 import os
 from sqlmodel import SQLModel, Session, select
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
 from models import user, item
 from models.user import User
 from models.item import Item
 from auth.hash_password import HashPassword
 from database.database import get_database_engine
+from database.config import get_settings
+from database.migrate_embeddings import migrate_embedding_columns, add_user_embedding_state, add_user_projection, add_item_updated_at
+from services.crud.item import SEARCH_CONFIG
+from services.recsys.embedding import encode_embedding, decode_embedding, parse_embedding_text
+from services.recsys.user_embedding import rebuild_user_embeddings
 import csv
-import ast
-import json
 import pathlib
 import logging # log
 
@@ -19,6 +24,38 @@ logger = logging.getLogger(__name__)
 if not logger.hasHandlers():
     logging.basicConfig(level=logging.INFO)
 
+# Полнотекстовый индекс по товарам: генерируемая tsvector-колонка + GIN,
+# триграммные GIN-индексы ускоряют поиск по подстроке (ILIKE '%q%')
+SEARCH_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    ALTER TABLE item ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_item_search_vector ON item USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_item_title_trgm ON item USING GIN (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_item_description_trgm ON item USING GIN (description gin_trgm_ops)",
+]
+
+def init_search_index(engine: Engine) -> None:
+    """
+    Создаёт индексы полнотекстового поиска по товарам (только для PostgreSQL).
+
+    Колонка search_vector генерируемая, поэтому Postgres поддерживает её
+    в актуальном состоянии при любых вставках и обновлениях товаров.
+    """
+    if engine.dialect.name != "postgresql":
+        logger.info("Полнотекстовый индекс пропущен: СУБД %s", engine.dialect.name)
+        return
+
+    with engine.begin() as conn:
+        for statement in SEARCH_INDEX_DDL:
+            conn.execute(text(statement))
+    logger.info("Индексы полнотекстового поиска созданы")
+
 def init_db(drop_all: bool = False) -> None:
     """
     Инициализация схемы базы данных.
@@ -42,6 +79,18 @@ def init_db(drop_all: bool = False) -> None:
         logger.info("Таблицы в БД после create_all: %s", list(SQLModel.metadata.tables.keys()))
         logger.info("Таблицы созданы")
 
+        # Существующие БД: перевод JSON-эмбеддингов в бинарные колонки
+        settings = get_settings()
+        migrate_embedding_columns(engine, settings.EMBEDDING_DTYPE)
+        add_user_projection(engine)
+        add_item_updated_at(engine)
+        if add_user_embedding_state(engine):
+            with Session(engine) as session:
+                rebuild_user_embeddings(session, dtype=settings.EMBEDDING_DTYPE)
+
+        # Индексы создаются до загрузки товаров, чтобы не перезаписывать таблицу после
+        init_search_index(engine)
+
         # Создание начальных данных
         with Session(engine) as session:
             logger.info("Проверка пользователей в БД...")
@@ -81,14 +130,14 @@ def init_db(drop_all: bool = False) -> None:
 
                     for idx, row in enumerate(reader):
                         try:
-                            embedding = ast.literal_eval(row["embedding"])
-                            embedding = json.dumps(embedding) if isinstance(embedding, list) else None
+                            embedding = parse_embedding_text(row["embedding"])
+                            embedding = encode_embedding(embedding, settings.EMBEDDING_DTYPE) if embedding is not None else None
                         except Exception:
                             embedding = None
 
                         try:
-                            embedding_proj = ast.literal_eval(row["embedding_proj"])
-                            embedding_proj = json.dumps(embedding_proj) if isinstance(embedding_proj, list) else None
+                            embedding_proj = parse_embedding_text(row["embedding_proj"])
+                            embedding_proj = encode_embedding(embedding_proj, settings.EMBEDDING_DTYPE) if embedding_proj is not None else None
                         except Exception:
                             embedding_proj = None
 
@@ -125,12 +174,12 @@ def init_db(drop_all: bool = False) -> None:
                 sample_item = session.exec(select(Item).where(Item.embedding.is_not(None))).first()
                 if sample_item:
                     logger.info("Sample item id=%s, title=%s", sample_item.id, sample_item.title)
-                    logger.info("Raw embedding (truncated): %s...", sample_item.embedding[:100])
+                    logger.info("Raw embedding size: %d bytes", len(sample_item.embedding))
 
                     try:
-                        embedding_list = json.loads(sample_item.embedding)
-                        logger.info("Parsed embedding length: %d, type of first element: %s", 
-                                    len(embedding_list), type(embedding_list[0]) if embedding_list else "empty")
+                        embedding_vec = decode_embedding(sample_item.embedding)
+                        logger.info("Decoded embedding length: %d, dtype: %s",
+                                    len(embedding_vec), embedding_vec.dtype)
                     except Exception as e:
                         logger.error("Ошибка при десериализации embedding: %s", e)
 
@@ -0,0 +1,163 @@
+import sys
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from services.recsys.embedding import encode_embedding, parse_embedding_text
+
+
+logger = logging.getLogger(__name__)
+if not logger.hasHandlers():
+    logging.basicConfig(level=logging.INFO)
+
+# Колонки с эмбеддингами, которые раньше хранились JSON-текстом
+EMBEDDING_COLUMNS = [
+    ("item", "embedding"),
+    ("item", "embedding_proj"),
+    ("user", "embedding"),
+]
+
+BATCH_SIZE = 5000
+
+
+def _column_type(conn, table: str, column: str):
+    return conn.execute(
+        text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = :table AND column_name = :column"
+        ),
+        {"table": table, "column": column}
+    ).scalar()
+
+
+def _migrate_column(engine: Engine, table: str, column: str, dtype: str) -> int:
+    """
+    Переводит одну текстовую колонку в bytea.
+
+    Значения переносятся во временную колонку {column}_bin пачками по id,
+    затем старая колонка удаляется, а новая переименовывается.
+    Повторный запуск после сбоя продолжает с непереведённых строк.
+    """
+    quoted = f'"{table}"'
+    binary = f"{column}_bin"
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {quoted} ADD COLUMN IF NOT EXISTS {binary} bytea"))
+
+    converted = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    f"SELECT id, {column} FROM {quoted} "
+                    f"WHERE id > :last_id AND {column} IS NOT NULL AND {binary} IS NULL "
+                    f"ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": BATCH_SIZE}
+            ).all()
+            if not rows:
+                break
+
+            params = []
+            for row_id, raw in rows:
+                try:
+                    vec = parse_embedding_text(raw)
+                except Exception as e:
+                    logger.warning("Не удалось разобрать %s.%s id=%s: %s", table, column, row_id, e)
+                    vec = None
+                if vec is not None:
+                    params.append({"id": row_id, "blob": encode_embedding(vec, dtype)})
+
+            if params:
+                conn.execute(text(f"UPDATE {quoted} SET {binary} = :blob WHERE id = :id"), params)
+            converted += len(params)
+            last_id = rows[-1][0]
+        logger.info("%s.%s: переведено %d строк", table, column, converted)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {quoted} DROP COLUMN {column}"))
+        conn.execute(text(f"ALTER TABLE {quoted} RENAME COLUMN {binary} TO {column}"))
+    return converted
+
+
+def migrate_embedding_columns(engine: Engine, dtype: str = "float32") -> None:
+    """
+    Миграция эмбеддингов из JSON-текста в бинарный формат (только PostgreSQL).
+
+    Колонки, которые уже имеют тип bytea, пропускаются, поэтому
+    функцию безопасно вызывать при каждом запуске.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    for table, column in EMBEDDING_COLUMNS:
+        with engine.connect() as conn:
+            data_type = _column_type(conn, table, column)
+        if data_type != "text":
+            continue
+        logger.info("Миграция %s.%s из text в bytea (%s)...", table, column, dtype)
+        converted = _migrate_column(engine, table, column, dtype)
+        logger.info("Миграция %s.%s завершена: %d строк", table, column, converted)
+
+
+def add_user_embedding_state(engine: Engine) -> bool:
+    """
+    Добавляет в таблицу user колонки embedding_sum и likes_count (только PostgreSQL).
+
+    Возвращает:
+        bool: True, если колонки были добавлены и их нужно заполнить
+              (services.recsys.user_embedding.rebuild_user_embeddings)
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+
+    with engine.begin() as conn:
+        if _column_type(conn, "user", "likes_count") is not None:
+            return False
+        conn.execute(text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS embedding_sum bytea'))
+        conn.execute(text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS likes_count integer NOT NULL DEFAULT 0'))
+    logger.info("В таблицу user добавлены embedding_sum и likes_count")
+    return True
+
+
+def add_user_projection(engine: Engine) -> None:
+    """
+    Добавляет в таблицу user колонки embedding_proj и embedding_proj_version (только PostgreSQL).
+
+    Заполнять их не обязательно: пока проекция не сохранена,
+    воркер считает её сам.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        if _column_type(conn, "user", "embedding_proj_version") is not None:
+            return
+        conn.execute(text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS embedding_proj bytea'))
+        conn.execute(text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS embedding_proj_version varchar'))
+    logger.info("В таблицу user добавлены embedding_proj и embedding_proj_version")
+
+
+def add_item_updated_at(engine: Engine) -> None:
+    """
+    Добавляет в таблицу item колонку updated_at (только PostgreSQL).
+
+    Существующие строки получают текущее время: версия каталога
+    один раз сменится, и воркеры перечитают матрицу.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        if _column_type(conn, "item", "updated_at") is not None:
+            return
+        conn.execute(text("ALTER TABLE item ADD COLUMN IF NOT EXISTS updated_at timestamp NOT NULL DEFAULT now()"))
+    logger.info("В таблицу item добавлена updated_at")
+
+
+if __name__ == "__main__":
+    from database.database import get_database_engine
+    from database.config import get_settings
+
+    migrate_embedding_columns(get_database_engine(), get_settings().EMBEDDING_DTYPE)
+    sys.exit(0)
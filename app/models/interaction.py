@@ -29,3 +29,18 @@ class InteractionCreate(InteractionBase):
     Схема для создания лайка.
     """
     pass
+
+
+class InteractionBulkItem(InteractionBase):
+    """
+    Строка массовой загрузки взаимодействий.
+    """
+    liked: bool = True
+    timestamp: Optional[datetime] = None
+
+
+class InteractionBulk(SQLModel):
+    """
+    Схема массовой загрузки взаимодействий (история лайков, кликстрим).
+    """
+    interactions: List[InteractionBulkItem]
@@ -1,7 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
-from sqlalchemy import Column, Text
+from sqlalchemy import Column, Text, LargeBinary
 
 
 if TYPE_CHECKING:
@@ -28,17 +28,19 @@ class ItemBase(SQLModel):
 class Item(ItemBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # время последнего изменения строки (входит в версию каталога рекомендаций)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
 
-    # эмбеддинги для мультимодальной модели
-    embedding: Optional[str] = Field(
+    # эмбеддинги для мультимодальной модели, бинарные float32/float16 (см. services.recsys.embedding)
+    embedding: Optional[bytes] = Field(
         default=None,
-        sa_column=Column(Text),
+        sa_column=Column(LargeBinary),
         description="Сырой CLIP-вектор товара (для user-вектора)"
     )
     
-    embedding_proj: Optional[str] = Field(
+    embedding_proj: Optional[bytes] = Field(
         default=None,
-        sa_column=Column(Text),
+        sa_column=Column(LargeBinary),
         description="Проецированный нормализованный эмбеддинг товара (для FAISS)"
     )
 
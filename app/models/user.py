@@ -3,7 +3,7 @@ from pydantic import EmailStr
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 import json
-from sqlalchemy import Column, Text
+from sqlalchemy import Column, LargeBinary
 
 
 if TYPE_CHECKING:
@@ -29,16 +29,21 @@ class User(UserBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-    # эмбеддинг храним как JSON или text; зависит от БД — можно оптимизировать позже
-    embedding: Optional[str] = Field(default=None, sa_column=Column(Text), description="Вектор предпочтений пользователя")
+    # эмбеддинг храним бинарно (float32/float16), см. services.recsys.embedding
+    embedding: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary), description="Вектор предпочтений пользователя")
 
-    # связи (заполним позже)
+    # состояние для инкрементального пересчёта: embedding = embedding_sum / likes_count
+    embedding_sum: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary), description="Сумма эмбеддингов лайкнутых товаров (float32)")
+    likes_count: int = Field(default=0, description="Количество лайкнутых товаров с эмбеддингом")
+
+    # проекция embedding слоем user_projection модели, нормализованная; действительна для версии модели embedding_proj_version
+    embedding_proj: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary), description="Проецированный нормализованный вектор пользователя (float32)")
+    embedding_proj_version: Optional[str] = Field(default=None, description="Контрольная сумма весов модели, которой посчитана проекция")
+
+    # связи загружаются только явно (selectinload), загрузка пользователя читает одну строку
     interactions: List["Interaction"] = Relationship(back_populates="user")
 
-    recommendation_tasks: List["RecommendationTask"] = Relationship(
-        back_populates="user",
-        sa_relationship_kwargs={"lazy": "selectin"}
-    )
+    recommendation_tasks: List["RecommendationTask"] = Relationship(back_populates="user")
     
     def __str__(self):
         return f"User(id={self.id}, email={self.email})"
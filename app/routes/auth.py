@@ -3,12 +3,15 @@ from fastapi.security import OAuth2PasswordRequestForm
 from auth.hash_password import HashPassword
 from auth.jwt_handler import create_access_token
 from auth.authenticate import  authenticate
-from database.database import get_session
+from database.database import get_async_session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from services.crud import user as UsersService
 from database.config import get_settings
+from services.logging.logging import get_logger
 from typing import Dict
 
 
+logger = get_logger(logger_name=__name__)
 # Получаем настройки приложения
 settings = get_settings()
 # Создаем экземпляр роутера
@@ -20,7 +23,7 @@ hash_password = HashPassword()
 async def login_for_access_token(
     response: Response,
     form_data: OAuth2PasswordRequestForm=Depends(),
-    session=Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> Dict[str, str]:
     """
     Создает access token для аутентифицированного пользователя.
@@ -38,17 +41,30 @@ async def login_for_access_token(
         HTTPException: 401 если неверные учетные данные
     """    
     # Проверяем существование пользователя по email
-    user_exist = UsersService.get_user_by_email(form_data.username, session)
+    user_exist = await UsersService.get_user_by_email(form_data.username, session, UsersService.USER_AUTH)
     if user_exist is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User does not exist"
         )
     
-    # Проверяем правильность пароля
-    if hash_password.verify_hash(form_data.password, user_exist.password):
+    # Проверяем правильность пароля (bcrypt выполняется вне event loop)
+    verified, new_hash = await hash_password.verify_and_update_async(form_data.password, user_exist.password)
+    if verified:
         # Создаем JWT токен
         access_token = create_access_token(user_exist.email)
+
+        if new_hash:
+            # Хеш посчитан со старым work factor — сохраняем пересчитанный
+            user_id = user_exist.id
+            try:
+                user_exist.password = new_hash
+                session.add(user_exist)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.warning(f"Не удалось обновить хеш пароля пользователя {user_id}: {e}")
+
         # Устанавливаем токен в cookie
         response.set_cookie(
             key=settings.COOKIE_NAME, 
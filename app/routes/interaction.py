@@ -1,26 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from models.interaction import Interaction, InteractionCreate
+from sqlmodel import Session
+from models.interaction import Interaction, InteractionCreate, InteractionBulk, InteractionBulkItem
 from models.user import User
 from models.item import Item
 from database.database import get_session
 from auth.authenticate import authenticate
 from typing import Optional
-import numpy as np
-import json
+from services.crud.interaction import delete_interaction, upsert_interactions
+from services.recsys.embedding_updater import embedding_updater
+from services.recsys.interaction_buffer import interaction_buffer
+from database.config import get_settings
 
 
 interaction_route = APIRouter()
+settings = get_settings()
 
 @interaction_route.post("/like")
 def like_interaction(data: InteractionCreate, session: Session = Depends(get_session)):
     """
-    Обработка лайка пользователя к товару и пересчёт эмбеддинга.
+    Обработка лайка пользователя к товару.
+    Запрос фиксирует только взаимодействие, эмбеддинг пользователя
+    пересчитывается в фоне (services.recsys.embedding_updater).
     Если у пользователя ещё нет embedding — он создаётся по первому лайку.
     """
+    if settings.LIKE_BUFFER_ENABLED:
+        # Пользователь и товар проверяются до постановки в буфер: иначе клиент получил бы
+        # подтверждение лайка, который upsert_interactions при записи молча отбросит
+        if not session.get(User, data.user_id):
+            raise HTTPException(status_code=404, detail="User not found")
+        if not session.get(Item, data.item_id):
+            raise HTTPException(status_code=404, detail="Item not found")
+        # Лайк будет записан пачкой вместе с другими (services.recsys.interaction_buffer)
+        interaction_buffer.add(InteractionBulkItem(user_id=data.user_id, item_id=data.item_id))
+        return {"message": "Like queued."}
+
     try:
+        if not session.get(User, data.user_id):
+            raise HTTPException(status_code=404, detail="User not found")
+
         # Проверяем, был ли уже лайк
         interaction = session.get(Interaction, (data.user_id, data.item_id))
+        already_liked = interaction is not None and interaction.liked
         if interaction:
             interaction.liked = True
         else:
@@ -28,30 +48,66 @@ def like_interaction(data: InteractionCreate, session: Session = Depends(get_ses
             session.add(interaction)
         session.commit()
 
-        # Находим все embedding лайкнутых товаров
-        stmt = select(Item.embedding).join(Interaction).where(
-            Interaction.user_id == data.user_id,
-            Interaction.liked == True,
-            Item.embedding != None
-        )
-        embeddings = session.exec(stmt).all()
+        item = session.get(Item, data.item_id)
+        if not already_liked and item is not None and item.embedding is not None:
+            embedding_updater.submit(data.user_id, data.item_id, +1)
+            return {"message": "Like saved. User embedding update scheduled."}
+        return {"message": "Like saved. No embeddings available to update user."}
 
-        if embeddings:
-            vectors = np.array([json.loads(e) for e in embeddings])
-            new_emb = np.mean(vectors, axis=0).tolist()
+    except HTTPException:
+        session.rollback()
+        raise
+    except Exception as e:
+        session.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
 
-            user = session.get(User, data.user_id)
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
 
-            user.embedding = json.dumps(new_emb)
-            session.add(user)
-            session.commit()
+@interaction_route.post("/unlike")
+def unlike_interaction(data: InteractionCreate, session: Session = Depends(get_session)):
+    """
+    Отмена лайка: взаимодействие удаляется, эмбеддинг товара
+    вычитается из вектора пользователя в фоне.
+    """
+    try:
+        interaction = session.get(Interaction, (data.user_id, data.item_id))
+        if not interaction:
+            raise HTTPException(status_code=404, detail="Like not found")
+        was_liked = interaction.liked
 
-            return {"message": "Like saved. User embedding updated."}
-        else:
-            return {"message": "Like saved. No embeddings available to update user."}
+        delete_interaction(data.user_id, data.item_id, session)
+
+        item = session.get(Item, data.item_id)
+        if was_liked and item is not None and item.embedding is not None:
+            embedding_updater.submit(data.user_id, data.item_id, -1)
+        return {"message": "Like removed."}
 
+    except HTTPException:
+        session.rollback()
+        raise
+    except Exception as e:
+        session.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@interaction_route.post("/bulk")
+def bulk_interactions(data: InteractionBulk, session: Session = Depends(get_session)):
+    """
+    Массовая загрузка взаимодействий (история лайков, кликстрим).
+    Строки записываются многострочными INSERT ... ON CONFLICT DO UPDATE
+    одной транзакцией, эмбеддинг каждого затронутого пользователя
+    пересобирается один раз в фоне.
+    """
+    if len(data.interactions) > settings.INTERACTION_BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many interactions, max {settings.INTERACTION_BULK_MAX_ROWS}"
+        )
+    try:
+        user_ids = upsert_interactions(data.interactions, session)
+        session.commit()
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+
+    embedding_updater.submit_rebuild(user_ids)
+    return {"message": "Interactions saved.", "received": len(data.interactions), "users": len(user_ids)}
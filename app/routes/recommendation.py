@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 from sqlmodel import Session
 
 from models.recommendation_task import (
@@ -10,6 +12,9 @@ from models.recommendation_task import (
 )
 from services.crud.recommendation_task import RecommendationTaskService
 from services.rm.rm import rabbit_client
+from services.rm.notifier import task_notifier
+from services.recsys.cache import recommendation_cache
+from services.recsys.online import OnlineRecommender, get_online_recommender
 from services.logging.logging import get_logger
 from database.database import get_session
 from auth.authenticate import authenticate
@@ -21,6 +26,14 @@ def get_task_service(session: Session = Depends(get_session)) -> RecommendationT
     return RecommendationTaskService(session)
 
 
+def get_recommender() -> OnlineRecommender:
+    try:
+        return get_online_recommender()
+    except Exception as e:
+        logger.error(f"Online recommender unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Online recommendations are unavailable")
+
+
 @recs_route.post("/", response_model=RecommendationTaskRead, status_code=status.HTTP_201_CREATED)
 def create_recommendation_task(
     task_data: RecommendationTaskCreate,
@@ -29,23 +42,41 @@ def create_recommendation_task(
 ):
     """
     Создание задачи на рекомендации и отправка в очередь RabbitMQ.
+    Если для пользователя и запроса есть закэшированный результат,
+    задача сразу создаётся выполненной и в очередь не отправляется.
+    Если брокер не принял задачу, она помечается FAILED и возвращается 503.
     """
     created_task = None
     try:
+        cache_key = recommendation_cache.make_key(task_data.user_id, task_data.top_n or 10, task_data.query)
+        cached = recommendation_cache.get(cache_key)
+        if cached is not None:
+            created_task = task_service.create(task_data, result=cached)
+            logger.info(f"RecommendationTask served from cache: id={created_task.id}, user_id={created_task.user_id}")
+            return created_task
+
         # Создаём задачу в БД
         created_task = task_service.create(task_data)
         logger.info(f"RecommendationTask created: id={created_task.id}, user_id={created_task.user_id}, query={created_task.query}")
 
         # Отправляем в очередь
-        rabbit_client.send_task(created_task)
+        recommendation_cache.track(created_task.id, cache_key)
+        if not rabbit_client.send_task(created_task):
+            logger.error(f"RecommendationTask not queued: id={created_task.id}, broker unavailable")
+            task_service.set_status(created_task.id, TaskStatus.FAILED)
+            task_notifier.notify(created_task.id)
+            raise HTTPException(status_code=503, detail="Recommendation queue is unavailable")
         task_service.set_status(created_task.id, TaskStatus.QUEUED)
 
         return created_task
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error sending recommendation task: {str(e)}")
         if created_task:
             task_service.set_status(created_task.id, TaskStatus.FAILED)
+            task_notifier.notify(created_task.id)
         raise HTTPException(status_code=500, detail="Failed to send recommendation task")
 
 
@@ -60,6 +91,29 @@ def get_all_tasks(
     return task_service.get_all()
 
 
+@recs_route.get("/now")
+def recommend_now(
+    user_id: int,
+    top_n: int = Query(10, ge=1, le=50),
+    query: Optional[str] = None,
+    session: Session = Depends(get_session),
+    recommender: OnlineRecommender = Depends(get_recommender),
+    user_email: str = Depends(authenticate)
+):
+    """
+    Синхронные рекомендации: top_n считается сразу в процессе API
+    по резидентной матрице товаров, без задачи в очереди.
+    """
+    try:
+        item_ids = recommender.recommend(session, user_id, top_n, query)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except Exception as e:
+        logger.error(f"Failed to compute recommendations: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute recommendations")
+    return {"user_id": user_id, "query": query, "item_ids": item_ids}
+
+
 @recs_route.get("/{task_id}", response_model=RecommendationTaskRead)
 def get_task_by_id(
     task_id: int,
@@ -74,6 +128,42 @@ def get_task_by_id(
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
+@recs_route.get("/{task_id}/wait", response_model=RecommendationTaskRead)
+async def wait_for_task(
+    task_id: int,
+    timeout: float = Query(25, gt=0, le=60),
+    task_service: RecommendationTaskService = Depends(get_task_service),
+    user_email: str = Depends(authenticate)
+):
+    """
+    Long-poll статуса задачи: запрос удерживается до завершения задачи
+    или до истечения timeout секунд, после чего возвращается её текущее состояние.
+
+    Задача читается короткими сессиями до и после ожидания, так что
+    ожидающий запрос не держит соединение из пула.
+    """
+    engine = task_service.session.get_bind()
+
+    def read_task() -> Optional[RecommendationTask]:
+        with Session(engine) as session:
+            return session.get(RecommendationTask, task_id)
+
+    # Подписываемся до чтения из БД, чтобы не пропустить уведомление между ними
+    with task_notifier.subscribe(task_id) as done:
+        task = await run_in_threadpool(read_task)
+        if not task:
+            raise HTTPException(status_code=404, detail="Task not found")
+        if task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+            return task
+
+        try:
+            await asyncio.wait_for(done, timeout)
+        except asyncio.TimeoutError:
+            return task
+
+    return await run_in_threadpool(read_task)
+
+
 @recs_route.post("/send_task_result")
 def receive_ml_result(
     task_id: int,
@@ -90,6 +180,8 @@ def receive_ml_result(
             raise HTTPException(status_code=404, detail="Task not found")
 
         task_service.set_result(task_id, result)
+        recommendation_cache.resolve(task_id, result)
+        task_notifier.notify(task_id)
 
         logger.info(f"ML result saved: task_id={task_id}, result={result}")
         return {"status": "ok", "task_id": task_id}
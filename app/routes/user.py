@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from database.database import get_session
+from database.database import get_async_session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from auth.hash_password import HashPassword
 from models.user import UserCreate, UserRead
 from services.crud import user as UserService
@@ -17,7 +18,7 @@ hash_password = HashPassword()
     status_code=status.HTTP_201_CREATED,
     summary="Регистрация пользователя",
     description="Регистрация нового пользователя с помощью email и пароля")
-async def signup(user: UserCreate, session=Depends(get_session)) -> Dict[str, str]:
+async def signup(user: UserCreate, session: AsyncSession = Depends(get_async_session)) -> Dict[str, str]:
     """
     Создание новой учетной записи пользователя.
 
@@ -33,15 +34,15 @@ async def signup(user: UserCreate, session=Depends(get_session)) -> Dict[str, st
     """
 
     try:
-        user_exist = UserService.get_user_by_email(user.email, session)
+        user_exist = await UserService.get_user_by_email(user.email, session)
         
         if user_exist:
             raise HTTPException( 
                 status_code=status.HTTP_409_CONFLICT, 
                 detail="User with email provided exists already.")
         
-        user.password = hash_password.create_hash(user.password)
-        UserService.create_user(user, session)
+        user.password = await hash_password.create_hash_async(user.password)
+        await UserService.create_user(user, session)
         return {"message": "User created successfully"}
 
     except HTTPException as http_exc:
@@ -60,12 +61,12 @@ async def signup(user: UserCreate, session=Depends(get_session)) -> Dict[str, st
     summary="Получение всех пользователей",
     description="Возвращает список всех зарегистрированных пользователей"
 )
-async def get_all_users(session=Depends(get_session)) -> List[UserRead]:
+async def get_all_users(session: AsyncSession = Depends(get_async_session)) -> List[UserRead]:
     """
     Получает список всех пользователей.
     """
     try:
-        users = UserService.get_all_users(session)
+        users = await UserService.get_all_users(session)
         return users
     except Exception as e:
         logger.error(f"Get users error: {e}")
@@ -80,9 +81,9 @@ async def get_all_users(session=Depends(get_session)) -> List[UserRead]:
     summary="Получение пользователя по email",
     description="Возвращает информацию о пользователе по email"
 )
-async def get_user_by_email(email: str, session=Depends(get_session)) -> UserRead:
+async def get_user_by_email(email: str, session: AsyncSession = Depends(get_async_session)) -> UserRead:
     try:
-        user = UserService.get_user_by_email(email, session)
+        user = await UserService.get_user_by_email(email, session)
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
         return user
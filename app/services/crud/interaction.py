@@ -1,6 +1,7 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
 from sqlmodel import Session, select
-from models.interaction import Interaction
+from models.interaction import Interaction, InteractionBulkItem
 from models.user import User
 from models.item import Item
 
@@ -65,3 +66,58 @@ def get_item_liked_by_users(item_id: int, session: Session) -> List[User]:
         return session.exec(statement).all()
     except Exception as e:
         raise
+
+
+def _upsert_statement(session: Session, rows: List[dict]):
+    """Многострочный INSERT ... ON CONFLICT (user_id, item_id) DO UPDATE для текущей СУБД."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert не поддерживается для {dialect}")
+
+    statement = insert(Interaction.__table__).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "item_id"],
+        set_={"liked": statement.excluded.liked, "timestamp": statement.excluded.timestamp}
+    )
+
+
+def upsert_interactions(
+    interactions: Iterable[InteractionBulkItem],
+    session: Session,
+    chunk_size: int = 5000
+) -> Set[int]:
+    """
+    Вставляет или обновляет взаимодействия пачками многострочных INSERT ... ON CONFLICT.
+
+    Повторы одной пары (user_id, item_id) схлопываются до последней строки,
+    строки с несуществующими пользователями или товарами пропускаются.
+    Фиксация транзакции остаётся за вызывающим кодом.
+
+    Возвращает:
+        Set[int]: id пользователей, чьи взаимодействия изменились
+    """
+    rows = {}
+    now = datetime.utcnow()
+    for row in interactions:
+        rows[(row.user_id, row.item_id)] = {
+            "user_id": row.user_id,
+            "item_id": row.item_id,
+            "liked": row.liked,
+            "timestamp": row.timestamp or now,
+        }
+    if not rows:
+        return set()
+
+    user_ids = {user_id for user_id, _ in rows}
+    item_ids = {item_id for _, item_id in rows}
+    known_users = set(session.exec(select(User.id).where(User.id.in_(user_ids))).all())
+    known_items = set(session.exec(select(Item.id).where(Item.id.in_(item_ids))).all())
+    valid = [r for (u, i), r in rows.items() if u in known_users and i in known_items]
+
+    for start in range(0, len(valid), chunk_size):
+        session.exec(_upsert_statement(session, valid[start:start + chunk_size]))
+    return {r["user_id"] for r in valid}
@@ -1,9 +1,14 @@
 from typing import List, Optional
 from sqlmodel import Session, select
 from models.item import Item, ItemCreate
+from sqlalchemy import func, literal_column
 from sqlalchemy.orm import selectinload
 
 
+# Конфигурация текстового поиска Postgres, совпадает с колонкой search_vector из initdb
+SEARCH_CONFIG = "english"
+
+
 def get_all_items(session: Session) -> List[Item]:
     """
     Получает список всех товаров.
@@ -55,3 +60,53 @@ def delete_item(item_id: int, session: Session) -> bool:
     except Exception as e:
         session.rollback()
         raise
+
+
+def _like_pattern(query_text: str) -> str:
+    escaped = query_text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_condition(query_text: str, session: Session):
+    """
+    Условие полнотекстового поиска по названию и описанию товара.
+
+    На Postgres использует GIN-индекс по search_vector и триграммные индексы
+    (для совпадений по подстроке), на остальных СУБД — ilike.
+    """
+    pattern = _like_pattern(query_text)
+    substring = Item.title.ilike(pattern, escape="\\") | Item.description.ilike(pattern, escape="\\")
+    if session.get_bind().dialect.name != "postgresql":
+        return substring
+
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query_text)
+    return literal_column("search_vector").op("@@")(ts_query) | substring
+
+
+def search_statement(query_text: str, session: Session, limit: Optional[int] = None):
+    """
+    Запрос id товаров под поисковый запрос: на Postgres по убыванию
+    ts_rank_cd, при равенстве — триграммного сходства названия, иначе по id.
+    """
+    statement = select(Item.id).where(search_condition(query_text, session))
+    if session.get_bind().dialect.name == "postgresql":
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query_text)
+        statement = statement.order_by(
+            func.ts_rank_cd(literal_column("search_vector"), ts_query).desc(),
+            func.similarity(Item.title, query_text).desc()
+        )
+    else:
+        statement = statement.order_by(Item.id)
+    if limit:
+        statement = statement.limit(limit)
+    return statement
+
+
+def search_item_ids(query_text: str, session: Session, limit: Optional[int] = None) -> List[int]:
+    """
+    Возвращает id товаров, подходящих под поисковый запрос, по убыванию релевантности.
+    """
+    try:
+        return session.exec(search_statement(query_text, session, limit)).all()
+    except Exception as e:
+        raise
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from sqlmodel import Session, select
 
 from models.recommendation_task import (
@@ -12,13 +12,17 @@ class RecommendationTaskService:
     def __init__(self, session: Session):
         self.session = session
 
-    def create(self, task_create: RecommendationTaskCreate) -> RecommendationTask:
-        """Создаёт новую задачу на рекомендации"""
+    def create(self, task_create: RecommendationTaskCreate, result: Optional[str] = None) -> RecommendationTask:
+        """
+        Создаёт новую задачу на рекомендации.
+        Если передан готовый результат (из кэша), задача сразу создаётся выполненной.
+        """
         task = RecommendationTask(
             user_id=task_create.user_id,
             top_n=task_create.top_n or 10,
             query=task_create.query,
-            status=TaskStatus.NEW
+            result=result,
+            status=TaskStatus.NEW if result is None else TaskStatus.COMPLETED
         )
         self.session.add(task)
         self.session.commit()
@@ -59,6 +63,30 @@ class RecommendationTaskService:
         self.session.refresh(task)
         return task
 
+    def set_results(self, results: Dict[int, str]) -> List[RecommendationTask]:
+        """
+        Устанавливает результаты пачки задач одним запросом и одним коммитом.
+
+        Аргументы:
+            results: Отображение id задачи -> результат
+
+        Возвращает:
+            List[RecommendationTask]: Обновлённые задачи (неизвестные id пропускаются)
+        """
+        if not results:
+            return []
+        tasks = self.session.exec(
+            select(RecommendationTask).where(RecommendationTask.id.in_(list(results)))
+        ).all()
+        now = datetime.utcnow()
+        for task in tasks:
+            task.result = results[task.id]
+            task.status = TaskStatus.COMPLETED
+            task.updated_at = now
+            self.session.add(task)
+        self.session.commit()
+        return tasks
+
     def delete(self, task_id: int) -> bool:
         """Удаляет задачу"""
         task = self.get(task_id)
@@ -1,70 +1,92 @@
 from models.user import User, UserCreate
 from sqlmodel import Session, select
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
+from typing import List, Optional, Sequence
 
 
-def get_all_users(session: Session) -> List[User]:
+# Профили загрузки: сценарий читает только нужные ему колонки строки user.
+# Остальные колонки не загружаются, обращение к ним — ошибка (raiseload)
+USER_READ = (User.id, User.email, User.created_at)
+USER_AUTH = (User.id, User.email, User.password)
+USER_RECSYS = (User.id, User.embedding, User.embedding_proj, User.embedding_proj_version)
+
+
+def _load(columns: Sequence):
+    return load_only(*columns, raiseload=True)
+
+
+async def get_all_users(session: AsyncSession, columns: Sequence = USER_READ) -> List[User]:
     """
-    Получает всех пользователей с их взаимодействиями.
+    Получает всех пользователей (только колонки columns).
     """
     try:
-        statement = select(User).options(
-            selectinload(User.interactions)
-        )
-        return session.exec(statement).all()
+        statement = select(User).options(_load(columns))
+        return (await session.exec(statement)).all()
     except Exception as e:
         raise
 
-def get_user_by_id(user_id: int, session: Session) -> Optional[User]:
+async def get_user_by_id(user_id: int, session: AsyncSession, columns: Sequence = USER_READ) -> Optional[User]:
     """
-    Получает пользователя по ID.
+    Получает пользователя по ID (только колонки columns).
     """
     try:
-        statement = select(User).where(User.id == user_id).options(
-            selectinload(User.interactions)
-        )
-        return session.exec(statement).first()
+        statement = select(User).where(User.id == user_id).options(_load(columns))
+        return (await session.exec(statement)).first()
     except Exception as e:
         raise
 
-def get_user_by_email(email: str, session: Session) -> Optional[User]:
+def get_users_by_ids(user_ids: List[int], session: Session, columns: Sequence = USER_RECSYS) -> List[User]:
     """
-    Получает пользователя по email.
+    Получает пользователей по списку ID одним запросом (по умолчанию — только эмбеддинги).
+    Синхронная: используется ML-воркером и фоновыми потоками.
     """
     try:
-        statement = select(User).where(User.email == email).options(
-            selectinload(User.interactions)
-        )
-        return session.exec(statement).first()
+        statement = select(User).where(User.id.in_(user_ids)).options(_load(columns))
+        return session.exec(statement).all()
     except Exception as e:
         raise
 
-def create_user(user: UserCreate, session: Session) -> User:
+async def get_user_by_email(email: str, session: AsyncSession, columns: Sequence = USER_READ) -> Optional[User]:
+    """
+    Получает пользователя по email (только колонки columns).
+    """
+    try:
+        statement = select(User).where(User.email == email).options(_load(columns))
+        return (await session.exec(statement)).first()
+    except Exception as e:
+        raise
+
+async def create_user(user: UserCreate, session: AsyncSession) -> User:
     """
     Создаёт нового пользователя.
     """
     db_user = User.model_validate(user)  # Pydantic v2
     try:
         session.add(db_user)
-        session.commit()
-        session.refresh(db_user)
+        await session.commit()
+        await session.refresh(db_user)
         return db_user
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         raise
 
-def delete_user(user_id: int, session: Session) -> bool:
+async def delete_user(user_id: int, session: AsyncSession) -> bool:
     """
     Удаляет пользователя по ID.
     """
     try:
-        user = get_user_by_id(user_id, session)
+        # Связи нужны ORM при удалении, поэтому загружаются явно
+        statement = select(User).where(User.id == user_id).options(
+            selectinload(User.interactions),
+            selectinload(User.recommendation_tasks)
+        )
+        user = (await session.exec(statement)).first()
         if user:
-            session.delete(user)
-            session.commit()
+            await session.delete(user)
+            await session.commit()
             return True
         return False
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         raise
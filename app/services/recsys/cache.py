@@ -0,0 +1,138 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from database.config import get_settings
+
+
+def normalize_query(query: Optional[str]) -> Optional[str]:
+    """Нормализует поисковый запрос для ключей кэшей: регистр и пробелы не различаются."""
+    return " ".join(query.lower().split()) if query else None
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш ограниченного размера с временем жизни записей.
+
+    При превышении max_entries вытесняются давно не использованные записи,
+    просроченные записи удаляются при обращении к ним.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RecommendationCache:
+    """
+    Кэш готовых рекомендаций по ключу (user_id, embedding_version, top_n, query).
+
+    embedding_version — номер последнего изменения эмбеддинга пользователя
+    в этом процессе из общего монотонного счётчика: лайк выдаёт пользователю
+    новый номер (invalidate_user), так что ключи, построенные до лайка,
+    больше не совпадают, а устаревшие записи вытесняются по LRU и TTL.
+    Номера хранятся для max_entries недавно изменённых пользователей;
+    при вытеснении номер по умолчанию сдвигается за все выданные,
+    поэтому ключи вытесненного пользователя тоже перестают совпадать.
+
+    Результат попадает в кэш, когда воркер возвращает ответ на задачу:
+    при создании задачи ключ запоминается за её id (track), а при получении
+    результата — сохраняется (resolve).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.results = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.pending = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.max_entries = max_entries
+        self._versions: "OrderedDict[int, int]" = OrderedDict()
+        self._clock = 0
+        self._default_version = 0
+        self._lock = threading.Lock()
+
+    def embedding_version(self, user_id: int) -> int:
+        with self._lock:
+            return self._versions.get(user_id, self._default_version)
+
+    def make_key(self, user_id: int, top_n: Optional[int], query: Optional[str]) -> tuple:
+        return (user_id, self.embedding_version(user_id), top_n, normalize_query(query))
+
+    def get(self, key: tuple) -> Optional[str]:
+        return self.results.get(key)
+
+    def track(self, task_id: int, key: tuple) -> None:
+        """Запоминает ключ кэша для задачи, отправленной воркеру."""
+        self.pending.set(task_id, key)
+
+    def resolve(self, task_id: int, result: str) -> None:
+        """
+        Сохраняет результат задачи под ключом, запомненным при её создании.
+
+        Если эмбеддинг пользователя успел измениться, ключ уже устарел:
+        такой результат не сохраняется.
+        """
+        key = self.pending.pop(task_id)
+        if key is not None and key[1] == self.embedding_version(key[0]):
+            self.results.set(key, result)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Выдаёт пользователю новый embedding_version: его прежние ключи больше не совпадают."""
+        with self._lock:
+            self._clock += 1
+            self._versions[user_id] = self._clock
+            self._versions.move_to_end(user_id)
+            if len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+                self._clock += 1
+                self._default_version = self._clock
+
+    def clear(self) -> None:
+        self.results.clear()
+        self.pending.clear()
+        with self._lock:
+            self._versions.clear()
+            self._clock = 0
+            self._default_version = 0
+
+
+settings = get_settings()
+# Глобальный кэш рекомендаций процесса API
+recommendation_cache = RecommendationCache(
+    max_entries=settings.RECS_CACHE_MAX_ENTRIES,
+    ttl=settings.RECS_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,181 @@
+import time
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from models.item import Item
+from services.recsys.embedding import decode_embedding
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок каталога: id товаров и матрица их проекций.
+
+    Атрибуты:
+        ids: Отсортированный массив id товаров (int64)
+        matrix: Непрерывная матрица проецированных эмбеддингов (float32, n x dim)
+        version: Маркер версии каталога, по которому строился снимок
+        lexical: BM25-индекс по текстам товаров (если каталог загружен с текстами)
+        popularity: popularity_score товаров в порядке строк матрицы (float32)
+    """
+    ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    matrix: np.ndarray = field(default_factory=lambda: np.empty((0, 0), dtype=np.float32))
+    version: Optional[Tuple] = None
+    lexical: Optional[Any] = None
+    popularity: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, item_ids) -> np.ndarray:
+        """Переводит id товаров в номера строк матрицы (неизвестные id отбрасываются)."""
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if not len(self.ids) or not len(item_ids):
+            return np.empty(0, dtype=np.int64)
+        pos = np.searchsorted(self.ids, item_ids)
+        pos = np.clip(pos, 0, len(self.ids) - 1)
+        return pos[self.ids[pos] == item_ids]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Возвращает индексы k наибольших значений по последней оси, по убыванию.
+
+    Использует argpartition, поэтому полная сортировка не выполняется.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class ItemCatalog:
+    """
+    Резидентная в памяти матрица проецированных эмбеддингов товаров.
+
+    Загружается из БД один раз и переиспользуется между задачами.
+    Перезагрузка выполняется только при изменении маркера версии каталога,
+    который проверяется не чаще, чем раз в refresh_interval секунд.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0, with_lexical: bool = False):
+        self.refresh_interval = refresh_interval
+        self.with_lexical = with_lexical
+        self.snapshot = CatalogSnapshot()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _embedded_items():
+        return (Item.embedding != None) & (Item.embedding_proj != None)
+
+    def fetch_version(self, session: Session) -> Tuple:
+        """
+        Маркер версии каталога: количество, максимальный id, время последнего
+        изменения и сумма популярности.
+
+        updated_at ловит вставки и правки строк через ORM (в том числе замену
+        embedding_proj на месте), сумма популярности — и её обновления прямым SQL.
+        """
+        row = session.exec(
+            select(func.count(Item.id), func.max(Item.id), func.max(Item.updated_at), func.sum(Item.popularity_score))
+            .where(self._embedded_items())
+        ).one()
+        return tuple(row)
+
+    def load(self, session: Session, version: Optional[Tuple] = None) -> CatalogSnapshot:
+        """Полностью загружает матрицу проекций из БД и подменяет текущий снимок."""
+        started = time.perf_counter()
+        version = version or self.fetch_version(session)
+        capacity = version[0]
+
+        ids = np.empty(capacity, dtype=np.int64)
+        popularity = np.empty(capacity, dtype=np.float32)
+        matrix = None
+        texts = []
+        n = 0
+        columns = [Item.id, Item.embedding_proj, Item.popularity_score]
+        if self.with_lexical:
+            columns += [Item.title, Item.description]
+        rows = session.exec(
+            select(*columns)
+            .where(self._embedded_items())
+            .order_by(Item.id)
+            .execution_options(yield_per=5000)
+        )
+        for item_id, raw, popularity_score, *text in rows:
+            if n >= capacity:
+                break
+            try:
+                vec = decode_embedding(raw)
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать embedding товара {item_id}: {e}")
+                continue
+            if matrix is None:
+                matrix = np.empty((capacity, vec.shape[0]), dtype=np.float32)
+            if vec.shape[0] != matrix.shape[1]:
+                logger.warning(f"Неверная размерность embedding товара {item_id}: {vec.shape[0]}")
+                continue
+            ids[n] = item_id
+            popularity[n] = popularity_score or 0
+            matrix[n] = vec
+            texts.append(text)
+            n += 1
+
+        if matrix is None:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        lexical = None
+        if self.with_lexical:
+            # Импорт здесь: lexical сам зависит от top_k из этого модуля
+            from services.recsys.lexical import BM25Index
+            lexical = BM25Index.build(texts)
+        snapshot = CatalogSnapshot(
+            ids=ids[:n].copy(),
+            matrix=np.ascontiguousarray(matrix[:n]),
+            version=version,
+            lexical=lexical,
+            popularity=popularity[:n].copy()
+        )
+        self.snapshot = snapshot
+        self._checked_at = time.monotonic()
+        logger.info(
+            "Каталог загружен: %d товаров, dim=%d, %.2f с",
+            len(snapshot), snapshot.matrix.shape[1], time.perf_counter() - started
+        )
+        return snapshot
+
+    def refresh(self, session: Session, force: bool = False) -> CatalogSnapshot:
+        """
+        Перезагружает каталог, если изменился маркер версии.
+
+        Пустой каталог проверяется при каждом вызове, чтобы воркер
+        подхватил товары сразу после инициализации БД.
+        """
+        now = time.monotonic()
+        if not force and len(self.snapshot) and now - self._checked_at < self.refresh_interval:
+            return self.snapshot
+
+        with self._lock:
+            if not force and len(self.snapshot) and time.monotonic() - self._checked_at < self.refresh_interval:
+                return self.snapshot
+            version = self.fetch_version(session)
+            self._checked_at = time.monotonic()
+            if force or version != self.snapshot.version:
+                logger.info(f"Версия каталога изменилась: {self.snapshot.version} -> {version}")
+                return self.load(session, version)
+        return self.snapshot
@@ -0,0 +1,52 @@
+import json
+import ast
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+
+# Размерность CLIP-эмбеддингов товаров и пользователей
+EMBEDDING_DIM = 200
+
+# Допустимые форматы хранения: размер элемента в байтах -> dtype
+STORAGE_DTYPES = {4: np.float32, 2: np.float16}
+
+
+def encode_embedding(values: Union[Sequence[float], np.ndarray], dtype: str = "float32") -> bytes:
+    """
+    Упаковывает вектор в байты для колонки LargeBinary/bytea.
+
+    Аргументы:
+        values: Вектор эмбеддинга
+        dtype: Формат хранения: float32 или float16 (вдвое компактнее)
+    """
+    return np.asarray(values, dtype=dtype).tobytes()
+
+
+def decode_embedding(blob: Optional[bytes], dim: int = EMBEDDING_DIM) -> Optional[np.ndarray]:
+    """
+    Распаковывает байты эмбеддинга в вектор float32 без разбора текста.
+
+    Формат (float32/float16) определяется по длине блоба и размерности,
+    поэтому в одной колонке могут соседствовать оба формата.
+    """
+    if blob is None:
+        return None
+    itemsize, rest = divmod(len(blob), dim)
+    if rest or itemsize not in STORAGE_DTYPES:
+        raise ValueError(f"Некорректная длина эмбеддинга: {len(blob)} байт при dim={dim}")
+    vec = np.frombuffer(blob, dtype=STORAGE_DTYPES[itemsize])
+    return vec if vec.dtype == np.float32 else vec.astype(np.float32)
+
+
+def parse_embedding_text(text: Optional[str]) -> Optional[np.ndarray]:
+    """Разбирает текстовое представление вектора (JSON или Python-список), как в CSV и старых колонках."""
+    if not text:
+        return None
+    try:
+        values = json.loads(text)
+    except ValueError:
+        values = ast.literal_eval(text)
+    if not isinstance(values, list):
+        return None
+    return np.asarray(values, dtype=np.float32)
@@ -0,0 +1,248 @@
+import time
+import queue
+import logging
+import threading
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from models.item import Item
+from services.recsys.embedding import decode_embedding
+from services.recsys.user_embedding import lock_user, apply_delta, rebuild_user_embeddings
+from services.recsys.cache import recommendation_cache
+from services.recsys.projection import UserProjector, get_user_projector
+from database.database import engine as default_engine
+from database.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingUpdater:
+    """
+    Фоновый пересчёт эмбеддингов пользователей по событиям лайков.
+
+    Запрос лайка фиксирует только Interaction и ставит событие
+    (user_id, item_id, ±1) в очередь; массовая загрузка ставит событие
+    полной пересборки (user_id, None, 0). Поток-обработчик собирает события
+    за окно window_ms, сворачивает их по пользователям и обновляет
+    каждого затронутого пользователя один раз, одним коммитом на пачку.
+    Вместе с embedding сохраняется его проекция моделью (User.embedding_proj),
+    чтобы воркеру не приходилось проецировать вектор на каждую задачу.
+
+    Пересборка читает таблицу Interaction, поэтому лайк пользователя, чья
+    пересборка ещё в очереди, в неё уже попадёт и дельтой не ставится; лайк,
+    пришедший во время пересборки, превращается в новую пересборку.
+    Если запись пачки не удалась, её пользователи откладываются на пересборку
+    со своим сроком повтора, растущим с каждой неудачей пользователя подряд;
+    поток тем временем продолжает обрабатывать события остальных.
+
+    События хранятся в памяти процесса: если процесс упал до их обработки,
+    состояние восстанавливается services.recsys.user_embedding.rebuild_user_embeddings.
+
+    Attributes:
+        engine: Движок БД
+        window_ms: Окно накопления событий в миллисекундах
+        max_batch: Максимум событий в одной пачке
+        dtype: Формат хранения embedding
+    """
+
+    FAILURE_BACKOFF = 0.5
+    MAX_BACKOFF = 5
+    PROJECTOR_RETRY_SECONDS = 60
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        window_ms: int = 200,
+        max_batch: int = 1000,
+        dtype: str = "float32"
+    ):
+        self.engine = engine or default_engine
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.dtype = dtype
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._queued_rebuilds = set()
+        self._running_rebuilds = set()
+        self._retry_at = {}
+        self._retry_failures = {}
+        self._projector = None
+        self._projector_retry_at = 0.0
+
+    def projector(self) -> Optional[UserProjector]:
+        """
+        Проектор модели; пока веса недоступны, проекции не сохраняются,
+        а загрузка повторяется не чаще раза в PROJECTOR_RETRY_SECONDS.
+        """
+        if self._projector is None and time.monotonic() >= self._projector_retry_at:
+            try:
+                self._projector = get_user_projector()
+            except Exception as e:
+                logger.warning(f"Проекции пользователей пока не сохраняются: {e}")
+                self._projector_retry_at = time.monotonic() + self.PROJECTOR_RETRY_SECONDS
+        return self._projector
+
+    def submit(self, user_id: int, item_id: int, sign: int) -> None:
+        """Ставит в очередь лайк (sign=1) или отмену лайка (sign=-1)."""
+        with self._rebuild_lock:
+            if user_id in self._queued_rebuilds or user_id in self._retry_at:
+                return
+            if user_id in self._running_rebuilds:
+                self._enqueue_rebuild(user_id)
+                return
+        self._queue.put((user_id, item_id, sign))
+
+    def submit_rebuild(self, user_ids) -> None:
+        """Ставит в очередь полную пересборку эмбеддингов пользователей по Interaction."""
+        with self._rebuild_lock:
+            for user_id in user_ids:
+                if user_id not in self._queued_rebuilds and user_id not in self._retry_at:
+                    self._enqueue_rebuild(user_id)
+
+    def submit_due_retries(self) -> None:
+        """Ставит в очередь пересборки отложенных пользователей, чей срок повтора наступил."""
+        now = time.monotonic()
+        with self._rebuild_lock:
+            for user_id in [u for u, retry_at in self._retry_at.items() if retry_at <= now]:
+                del self._retry_at[user_id]
+                if user_id not in self._queued_rebuilds:
+                    self._enqueue_rebuild(user_id)
+
+    def _enqueue_rebuild(self, user_id: int) -> None:
+        # Вызывается под self._rebuild_lock
+        self._queued_rebuilds.add(user_id)
+        self._queue.put((user_id, None, 0))
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="embedding-updater", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+    def run(self) -> None:
+        window = self.window_ms / 1000
+        while not self._stop.is_set():
+            self.submit_due_retries()
+            try:
+                events = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + window
+            while len(events) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    events.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.process(events)
+
+    def flush(self) -> None:
+        """Обрабатывает все накопленные события и наступившие повторы немедленно."""
+        self.submit_due_retries()
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(events), self.max_batch):
+            self.process(events[start:start + self.max_batch])
+
+    def process(self, events: list) -> None:
+        """Применяет пачку событий: одна блокировка и одна запись на пользователя."""
+        deltas = defaultdict(lambda: defaultdict(int))
+        rebuild = set()
+        for user_id, item_id, sign in events:
+            if item_id is None:
+                rebuild.add(user_id)
+            else:
+                deltas[user_id][item_id] += sign
+        # События ставятся после коммита взаимодействия, поэтому пересборка
+        # по таблице Interaction уже учитывает все дельты пользователя из пачки
+        for user_id in rebuild:
+            deltas.pop(user_id, None)
+        with self._rebuild_lock:
+            self._queued_rebuilds -= rebuild
+            self._running_rebuilds |= rebuild
+
+        projector = self.projector()
+        try:
+            with self._lock, Session(self.engine) as session:
+                if rebuild:
+                    rebuild_user_embeddings(session, rebuild, self.dtype, projector)
+                item_ids = {item_id for items in deltas.values() for item_id in items}
+                embeddings = {}
+                if item_ids:
+                    embeddings = dict(session.exec(
+                        select(Item.id, Item.embedding).where(Item.id.in_(item_ids), Item.embedding != None)
+                    ).all())
+
+                # Пользователи блокируются в порядке id, чтобы параллельные транзакции не взаимоблокировались
+                for user_id in sorted(deltas):
+                    items = {i: s for i, s in deltas[user_id].items() if s and i in embeddings}
+                    if not items:
+                        continue
+                    user = lock_user(user_id, session)
+                    if not user:
+                        continue
+                    delta = sum(sign * decode_embedding(embeddings[i]) for i, sign in items.items())
+                    apply_delta(user, np.asarray(delta, dtype=np.float32), sum(items.values()), self.dtype, projector)
+                    session.add(user)
+                session.commit()
+        except Exception as e:
+            logger.error(f"Не удалось обновить эмбеддинги пользователей {sorted(rebuild | set(deltas))}: {e}")
+            self.retry_later(rebuild | set(deltas))
+            return
+        finally:
+            with self._rebuild_lock:
+                self._running_rebuilds -= rebuild
+
+        with self._rebuild_lock:
+            for user_id in rebuild | set(deltas):
+                self._retry_failures.pop(user_id, None)
+        for user_id in rebuild | set(deltas):
+            recommendation_cache.invalidate_user(user_id)
+        logger.info("Эмбеддинги обновлены: %d событий, %d пользователей", len(events), len(rebuild | set(deltas)))
+
+    def retry_later(self, user_ids: set) -> None:
+        """
+        Откладывает пересборку пользователей неудавшейся пачки, не останавливая поток.
+
+        Срок повтора растёт с числом неудач пользователя подряд. Пересборка
+        по Interaction идемпотентна, поэтому повтор не зависит от того,
+        какие дельты пачки успели примениться до ошибки; новые события
+        отложенного пользователя ею же и учитываются.
+        """
+        now = time.monotonic()
+        with self._rebuild_lock:
+            for user_id in user_ids:
+                failures = self._retry_failures.get(user_id, 0) + 1
+                self._retry_failures[user_id] = failures
+                self._retry_at[user_id] = now + min(self.FAILURE_BACKOFF * 2 ** (failures - 1), self.MAX_BACKOFF)
+
+
+settings = get_settings()
+# Глобальный обработчик, запускается при старте приложения
+embedding_updater = EmbeddingUpdater(
+    window_ms=settings.EMBEDDING_UPDATE_WINDOW_MS,
+    max_batch=settings.EMBEDDING_UPDATE_MAX_BATCH,
+    dtype=settings.EMBEDDING_DTYPE
+)
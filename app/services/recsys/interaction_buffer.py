@@ -0,0 +1,108 @@
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from models.interaction import InteractionBulkItem
+from services.crud.interaction import upsert_interactions
+from services.recsys.embedding_updater import embedding_updater
+from database.database import engine as default_engine
+from database.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class InteractionBuffer:
+    """
+    Буфер отложенной записи одиночных лайков.
+
+    Лайки копятся в памяти и записываются пачкой через upsert_interactions
+    раз в flush_ms или при накоплении max_rows строк, после чего
+    эмбеддинги затронутых пользователей пересобираются один раз.
+    Если запись не удалась, строки возвращаются в начало буфера и пишутся
+    повторно, а следующая попытка откладывается тем дольше, чем больше
+    неудач подряд. Незаписанные лайки теряются при падении процесса,
+    поэтому буфер включается настройкой LIKE_BUFFER_ENABLED.
+
+    Attributes:
+        engine: Движок БД
+        flush_ms: Период записи буфера в миллисекундах
+        max_rows: Размер буфера, при котором запись начинается досрочно
+    """
+
+    MAX_BACKOFF = 30
+
+    def __init__(self, engine: Optional[Engine] = None, flush_ms: int = 500, max_rows: int = 5000):
+        self.engine = engine or default_engine
+        self.flush_ms = flush_ms
+        self.max_rows = max_rows
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0
+
+    def add(self, row: InteractionBulkItem) -> None:
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="interaction-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_ms / 1000)
+            self._wakeup.clear()
+            self.flush()
+            if self._failures:
+                self._stop.wait(min(self.flush_ms / 1000 * 2 ** self._failures, self.MAX_BACKOFF))
+
+    def flush(self) -> int:
+        """Записывает накопленные лайки одной транзакцией; возвращает количество строк."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                with Session(self.engine) as session:
+                    user_ids = upsert_interactions(rows, session)
+                    session.commit()
+            except Exception as e:
+                logger.error(f"Не удалось записать буфер лайков ({len(rows)} строк), повтор позже: {e}")
+                # Порядок строк сохраняется: при upsert побеждает последняя
+                with self._lock:
+                    self._rows = rows + self._rows
+                self._failures += 1
+                return 0
+            self._failures = 0
+            embedding_updater.submit_rebuild(user_ids)
+            logger.info("Буфер лайков записан: %d строк, %d пользователей", len(rows), len(user_ids))
+            return len(rows)
+
+
+settings = get_settings()
+# Глобальный буфер лайков, запускается при старте приложения, если включён
+interaction_buffer = InteractionBuffer(
+    flush_ms=settings.LIKE_BUFFER_FLUSH_MS,
+    max_rows=settings.LIKE_BUFFER_MAX_ROWS
+)
@@ -0,0 +1,160 @@
+import os
+import re
+import json
+import logging
+from array import array
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from services.recsys.catalog import top_k
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or that the this to with".split()
+)
+
+
+def tokenize(text: Optional[str]) -> list:
+    """Разбивает текст на нормализованные токены без стоп-слов."""
+    if not text:
+        return []
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class BM25Index:
+    """
+    Инвертированный индекс BM25 по названиям и описаниям товаров.
+
+    Постинги хранятся компактно в CSR-виде: для термина t документы
+    лежат в docs[offsets[t]:offsets[t + 1]], рядом — предрасчитанные
+    BM25-веса (idf * насыщенная частота), так что запрос сводится
+    к сложению весов по нескольким срезам массивов.
+
+    Номера документов совпадают с номерами строк снимка каталога.
+    """
+
+    def __init__(self, vocab: dict, offsets: np.ndarray, docs: np.ndarray, weights: np.ndarray, n_docs: int):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.n_docs = n_docs
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    @classmethod
+    def build(
+        cls,
+        documents: Iterable[Tuple[Optional[str], Optional[str]]],
+        title_weight: int = 2,
+        k1: float = 1.2,
+        b: float = 0.75
+    ) -> "BM25Index":
+        """
+        Строит индекс по последовательности пар (title, description).
+
+        Токены названия учитываются с весом title_weight.
+        """
+        vocab = {}
+        term_ids = array("i")
+        doc_ids = array("i")
+        tfs = array("f")
+        doc_len = array("f")
+
+        for doc, (title, description) in enumerate(documents):
+            counts = Counter(tokenize(description))
+            for token in tokenize(title):
+                counts[token] += title_weight
+            for token, tf in counts.items():
+                term_ids.append(vocab.setdefault(token, len(vocab)))
+                doc_ids.append(doc)
+                tfs.append(tf)
+            doc_len.append(sum(counts.values()))
+
+        n_docs = len(doc_len)
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        docs = np.frombuffer(doc_ids, dtype=np.int32)[order]
+        tf = np.frombuffer(tfs, dtype=np.float32)[order]
+        lengths = np.frombuffer(doc_len, dtype=np.float32)
+
+        df = np.bincount(term_ids, minlength=len(vocab))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(lengths.mean()) if n_docs else 1.0
+        norm = k1 * (1 - b + b * lengths[docs] / max(avgdl, 1e-6))
+        weights = np.repeat(idf, df) * tf * (k1 + 1) / (tf + norm)
+
+        logger.info("BM25-индекс построен: %d документов, %d терминов", n_docs, len(vocab))
+        return cls(vocab, offsets, docs, weights.astype(np.float32), n_docs)
+
+    def save(self, directory: str) -> None:
+        """Сохраняет массивы постингов в .npy и словарь в JSON."""
+        np.save(os.path.join(directory, "bm25_offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, "bm25_docs.npy"), self.docs)
+        np.save(os.path.join(directory, "bm25_weights.npy"), self.weights)
+        with open(os.path.join(directory, "bm25_vocab.json"), "w", encoding="utf-8") as f:
+            json.dump({"n_docs": self.n_docs, "vocab": self.vocab}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "BM25Index":
+        """Загружает индекс, сохранённый save; массивы постингов отображаются в память."""
+        with open(os.path.join(directory, "bm25_vocab.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            meta["vocab"],
+            np.load(os.path.join(directory, "bm25_offsets.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "bm25_docs.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "bm25_weights.npy"), mmap_mode=mmap_mode),
+            meta["n_docs"]
+        )
+
+    def search(self, query: str, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Ищет документы по запросу.
+
+        Если есть документы, содержащие все термины запроса, возвращаются только они,
+        иначе — все документы хотя бы с одним термином.
+
+        Возвращает:
+            Tuple: номера документов и их BM25-скоры, по убыванию скора
+        """
+        terms = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        hits = np.zeros(self.n_docs, dtype=np.int16)
+        for t in terms:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.docs[start:end]
+            scores[docs] += self.weights[start:end]
+            hits[docs] += 1
+
+        matched = np.flatnonzero(hits == len(terms))
+        if not len(matched):
+            matched = np.flatnonzero(hits)
+
+        order = top_k(scores[matched], limit or len(matched))
+        matched = matched[order]
+        return matched, scores[matched]
+
+
+def fuse_scores(lexical: np.ndarray, vector: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Гибридный скор: взвешенная сумма нормированного BM25 и скалярного произведения.
+
+    BM25 нормируется на максимум запроса в [0, 1], косинусная близость уже лежит в [-1, 1].
+    """
+    top = float(lexical.max()) if len(lexical) else 0.0
+    lexical = lexical / top if top > 0 else lexical
+    return alpha * lexical + (1 - alpha) * vector
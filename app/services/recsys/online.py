@@ -0,0 +1,108 @@
+import logging
+import threading
+from typing import Optional
+
+from sqlmodel import Session
+
+from services.crud import item as ItemService
+from services.crud import user as UserService
+from services.recsys.catalog import ItemCatalog
+from services.recsys.embedding import decode_embedding
+from services.recsys.projection import UserProjector, get_user_projector
+from services.recsys.user_embedding import projected_embedding
+from services.recsys.ranking import rank_exact
+from services.recsys.popular import PopularItems
+from database.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class OnlineRecommender:
+    """
+    Синхронные рекомендации прямо в процессе API.
+
+    Матрица проекций товаров резидентна (ItemCatalog), вектор пользователя
+    берётся сохранённым (User.embedding_proj) или проецируется на NumPy,
+    так что запрос обходится без очереди и воркера.
+    """
+
+    def __init__(
+        self,
+        projector: UserProjector,
+        catalog: ItemCatalog,
+        search_max_candidates: int = 10000,
+        hybrid_alpha: float = 0.5,
+        popular: Optional[PopularItems] = None
+    ):
+        self.projector = projector
+        self.catalog = catalog
+        self.popular = popular or PopularItems()
+        self.search_max_candidates = search_max_candidates
+        self.hybrid_alpha = hybrid_alpha
+
+    def popular_items(self, session: Session, snapshot, top_n: int, query: Optional[str]) -> list:
+        """Fallback для пользователей без эмбеддинга: самые популярные (или релевантные запросу) товары."""
+        if query and snapshot.lexical is not None:
+            positions, _ = snapshot.lexical.search(query, limit=top_n)
+            return snapshot.ids[positions].tolist()
+        return self.popular.get(session, top_n, query)
+
+    def recommend(self, session: Session, user_id: int, top_n: int, query: Optional[str] = None) -> list:
+        """
+        Возвращает id top_n товаров для пользователя.
+
+        Исключения:
+            LookupError: Пользователь не найден
+        """
+        snapshot = self.catalog.refresh(session)
+        users = UserService.get_users_by_ids([user_id], session)
+        if not users:
+            raise LookupError("User not found")
+        user = users[0]
+
+        if not user.embedding:
+            return self.popular_items(session, snapshot, top_n, query)
+
+        candidates, lexical_scores = None, None
+        if query:
+            if snapshot.lexical is not None:
+                candidates, lexical_scores = snapshot.lexical.search(query, limit=self.search_max_candidates)
+            else:
+                candidate_ids = ItemService.search_item_ids(query, session, limit=self.search_max_candidates)
+                candidates = snapshot.positions(candidate_ids)
+            if not len(candidates):
+                return []
+
+        user_vec = projected_embedding(user, self.projector.version)
+        if user_vec is None:
+            user_vec = self.projector.project(decode_embedding(user.embedding))
+        return rank_exact(snapshot, user_vec, top_n, candidates, lexical_scores, self.hybrid_alpha)
+
+
+_recommender: Optional[OnlineRecommender] = None
+_recommender_lock = threading.Lock()
+
+
+def get_online_recommender() -> OnlineRecommender:
+    """Создаёт рекомендатель процесса при первом обращении (веса модели и каталог грузятся один раз)."""
+    global _recommender
+    if _recommender is None:
+        with _recommender_lock:
+            if _recommender is None:
+                settings = get_settings()
+                _recommender = OnlineRecommender(
+                    projector=get_user_projector(),
+                    catalog=ItemCatalog(
+                        refresh_interval=settings.CATALOG_REFRESH_SECONDS,
+                        with_lexical=settings.SEARCH_BACKEND == "bm25"
+                    ),
+                    search_max_candidates=settings.SEARCH_MAX_CANDIDATES,
+                    hybrid_alpha=settings.SEARCH_HYBRID_ALPHA,
+                    popular=PopularItems(
+                        top_k=settings.POPULAR_TOP_K,
+                        max_queries=settings.POPULAR_QUERY_CACHE_SIZE,
+                        refresh_interval=settings.POPULAR_REFRESH_SECONDS
+                    )
+                )
+    return _recommender
@@ -0,0 +1,96 @@
+import time
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from models.item import Item
+from services.crud import item as ItemService
+from services.recsys.cache import TTLCache, normalize_query
+
+
+logger = logging.getLogger(__name__)
+
+
+class PopularItems:
+    """
+    Популярные товары для пользователей без эмбеддинга, из памяти процесса.
+
+    Держит глобальный top_k id по popularity_score и LRU списков популярных
+    товаров по нормализованному поисковому запросу. Маркер популярности
+    (количество товаров, сумма popularity_score, максимальный id) проверяется
+    не чаще, чем раз в refresh_interval секунд; при его изменении глобальный
+    список перечитывается, а списки по запросам сбрасываются.
+
+    Attributes:
+        top_k: Размер глобального списка популярных товаров
+        query_limit: Сколько id хранится для одного запроса
+        refresh_interval: Период проверки маркера популярности в секундах
+    """
+
+    def __init__(self, top_k: int = 1000, max_queries: int = 10000, query_limit: int = 50, refresh_interval: float = 60.0):
+        self.top_k = top_k
+        self.query_limit = query_limit
+        self.refresh_interval = refresh_interval
+        self.queries = TTLCache(max_entries=max_queries, ttl=float("inf"))
+        self.version: Optional[Tuple] = None
+        self.top_ids: List[int] = []
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _embedded_items():
+        return Item.embedding != None
+
+    def fetch_version(self, session: Session) -> Tuple:
+        """Маркер популярности: количество товаров, сумма popularity_score и максимальный id."""
+        row = session.exec(
+            select(func.count(Item.id), func.sum(Item.popularity_score), func.max(Item.id))
+            .where(self._embedded_items())
+        ).one()
+        return tuple(row)
+
+    def _ranked(self, session: Session, limit: int, query: Optional[str] = None) -> List[int]:
+        statement = select(Item.id).where(self._embedded_items())
+        if query:
+            statement = statement.where(ItemService.search_condition(query, session))
+        return list(session.exec(statement.order_by(Item.popularity_score.desc()).limit(limit)).all())
+
+    def refresh(self, session: Session, force: bool = False) -> None:
+        """Перечитывает популярные товары, если изменился маркер популярности."""
+        if not force and self.version is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+
+        with self._lock:
+            if not force and self.version is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            version = self.fetch_version(session)
+            self._checked_at = time.monotonic()
+            if force or version != self.version:
+                self.top_ids = self._ranked(session, self.top_k)
+                self.queries.clear()
+                self.version = version
+                logger.info(f"Популярные товары обновлены: {len(self.top_ids)} id, маркер {version}")
+
+    def get(self, session: Session, top_n: int, query: Optional[str] = None) -> List[int]:
+        """
+        Возвращает id top_n самых популярных товаров (среди подходящих под запрос, если он задан).
+
+        Повторные запросы до смены популярности обслуживаются из памяти.
+        """
+        self.refresh(session)
+        if not query:
+            if top_n <= self.top_k:
+                return self.top_ids[:top_n]
+            return self._ranked(session, top_n)
+
+        key = normalize_query(query)
+        cached = self.queries.get(key)
+        # Список неполон, только если упёрся в свой limit: иначе товаров под запрос больше нет
+        if cached is None or (cached[0] < top_n and len(cached[1]) == cached[0]):
+            limit = max(top_n, self.query_limit)
+            cached = (limit, self._ranked(session, limit, query))
+            self.queries.set(key, cached)
+        return cached[1][:top_n]
@@ -0,0 +1,95 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+
+from database.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserProjector:
+    """
+    Проекция сырых векторов пользователей (слой user_projection модели) на NumPy.
+
+    Веса один раз читаются из экспорта .npz (его создаёт export_model.py
+    из чекпоинта ContrastiveDotModel), дальше проекция — одно матричное
+    умножение без torch.
+    version — контрольная сумма весов: сохранённая проекция пользователя
+    (User.embedding_proj) действительна, только пока она совпадает.
+    """
+
+    def __init__(self, weight: np.ndarray, bias: np.ndarray):
+        weight = np.asarray(weight, dtype=np.float32)
+        self.weight_t = np.ascontiguousarray(weight.T)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.version = model_checksum(weight, self.bias)
+
+    @classmethod
+    def from_checkpoint(cls, path: str) -> "UserProjector":
+        """Загружает веса user_projection из state_dict модели (.pth)."""
+        # torch нужен только для чтения чекпоинта
+        import torch
+
+        state = torch.load(path, map_location="cpu")
+        weight = state["user_projection.weight"].numpy()
+        bias = state["user_projection.bias"].numpy()
+        logger.info(f"Веса user_projection загружены из {path}: {weight.shape}")
+        return cls(weight, bias)
+
+    @classmethod
+    def from_npz(cls, path: str) -> "UserProjector":
+        """Загружает веса user_projection из экспорта .npz (см. save)."""
+        with np.load(path) as weights:
+            projector = cls(weights["weight"], weights["bias"])
+        logger.info(f"Веса user_projection загружены из {path}: {projector.weight_t.shape}")
+        return projector
+
+    def save(self, path: str) -> None:
+        """Сохраняет веса в .npz, который читается без torch."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, weight=self.weight_t.T, bias=self.bias)
+
+    def project(self, embeddings) -> np.ndarray:
+        """Проецирует и L2-нормализует векторы пользователей (n x dim или dim)."""
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        proj = vecs @ self.weight_t + self.bias
+        norm = np.linalg.norm(proj, axis=-1, keepdims=True)
+        return proj / np.maximum(norm, 1e-12)
+
+
+def model_checksum(weight: np.ndarray, bias: np.ndarray) -> str:
+    """Контрольная сумма весов user_projection (версия сохранённых проекций пользователей)."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(weight, dtype=np.float32).tobytes())
+    digest.update(np.ascontiguousarray(bias, dtype=np.float32).tobytes())
+    return digest.hexdigest()[:16]
+
+
+_projector: Optional[UserProjector] = None
+_projector_lock = threading.Lock()
+
+
+def get_user_projector() -> UserProjector:
+    """
+    Загружает проектор процесса при первом обращении из экспорта settings.MODEL_WEIGHTS_PATH.
+
+    Исключения:
+        FileNotFoundError: Если экспорта нет (чекпоинт здесь не читается: torch не установлен)
+    """
+    global _projector
+    if _projector is None:
+        with _projector_lock:
+            if _projector is None:
+                path = get_settings().MODEL_WEIGHTS_PATH
+                if not os.path.exists(path):
+                    raise FileNotFoundError(
+                        f"Не найден экспорт весов user_projection: {path}. "
+                        f"Создайте его из чекпоинта: python export_model.py --out {path}"
+                    )
+                _projector = UserProjector.from_npz(path)
+    return _projector
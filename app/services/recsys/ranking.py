@@ -0,0 +1,42 @@
+from typing import Optional
+
+import numpy as np
+
+from services.recsys.catalog import CatalogSnapshot, top_k
+from services.recsys.lexical import fuse_scores
+
+
+def rank_exact(
+    snapshot: CatalogSnapshot,
+    user_vec: np.ndarray,
+    top_n: int,
+    candidates: Optional[np.ndarray] = None,
+    lexical_scores: Optional[np.ndarray] = None,
+    alpha: float = 0.5
+) -> list:
+    """
+    Точное ранжирование товаров снимка по скалярному произведению с вектором пользователя.
+
+    Аргументы:
+        snapshot: Снимок каталога
+        user_vec: Проецированный нормализованный вектор пользователя
+        top_n: Количество товаров в ответе
+        candidates: Номера строк матрицы, которыми ограничен поиск (None — весь каталог)
+        lexical_scores: BM25-скоры кандидатов; если заданы, итоговый скор гибридный
+        alpha: Вес BM25 в гибридном скоре
+
+    Возвращает:
+        list: id товаров по убыванию скора
+    """
+    if candidates is None:
+        matrix, ids = snapshot.matrix, snapshot.ids
+    else:
+        matrix, ids = snapshot.matrix[candidates], snapshot.ids[candidates]
+
+    if not len(ids):
+        raise ValueError("Нет валидных item-векторов для ранжирования")
+
+    scores = matrix @ user_vec
+    if lexical_scores is not None:
+        scores = fuse_scores(lexical_scores, scores, alpha)
+    return ids[top_k(scores, top_n)].tolist()
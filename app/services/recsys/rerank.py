@@ -0,0 +1,96 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+from services.recsys.catalog import CatalogSnapshot, top_k
+
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """
+    Второй этап ранжирования: переоценка кандидатов, найденных по вектору.
+
+    Первый этап (FAISS или точный поиск) отбирает candidates товаров,
+    здесь они переоцениваются линейной моделью по признакам, которые уже
+    есть в снимке каталога: скалярное произведение с пользователем,
+    популярность и BM25-скор запроса. Признаки считаются одним матричным
+    выражением по кандидатам, так что стоимость этапа ограничена
+    числом кандидатов, а не размером каталога.
+
+    Attributes:
+        candidates: Сколько товаров отбирает первый этап
+        budget_ms: Бюджет времени на батч; после его исчерпания
+            задачи получают результат первого этапа без переоценки
+        weights: Веса признаков (dot, popularity, lexical)
+    """
+
+    FEATURES = ("dot", "popularity", "lexical")
+
+    def __init__(
+        self,
+        candidates: int = 500,
+        budget_ms: float = 20.0,
+        popularity_weight: float = 0.1,
+        lexical_weight: float = 0.3
+    ):
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self.weights = np.array([1.0, popularity_weight, lexical_weight], dtype=np.float32)
+
+    @staticmethod
+    def _scale(values: np.ndarray) -> np.ndarray:
+        """Приводит признак к [0, 1] в пределах набора кандидатов."""
+        top = values.max() if len(values) else 0.0
+        return values / top if top > 0 else np.zeros_like(values)
+
+    def features(
+        self,
+        snapshot: CatalogSnapshot,
+        user_vec: np.ndarray,
+        positions: np.ndarray,
+        candidates: Optional[np.ndarray] = None,
+        lexical_scores: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Матрица признаков кандидатов (m x 3).
+
+        Аргументы:
+            snapshot: Снимок каталога
+            user_vec: Проецированный нормализованный вектор пользователя
+            positions: Номера строк матрицы, отобранные первым этапом
+            candidates, lexical_scores: Кандидаты поискового запроса и их BM25-скоры
+        """
+        features = np.zeros((len(positions), len(self.FEATURES)), dtype=np.float32)
+        features[:, 0] = snapshot.matrix[positions] @ user_vec
+
+        if snapshot.popularity is not None:
+            features[:, 1] = self._scale(np.log1p(np.maximum(snapshot.popularity[positions], 0)))
+
+        if lexical_scores is not None and len(candidates):
+            # BM25-скоры выбираются по отсортированным кандидатам, без плотного массива на весь каталог
+            order = np.argsort(candidates)
+            sorted_candidates = candidates[order]
+            at = np.clip(np.searchsorted(sorted_candidates, positions), 0, len(sorted_candidates) - 1)
+            found = sorted_candidates[at] == positions
+            lexical = np.where(found, np.asarray(lexical_scores, dtype=np.float32)[order[at]], 0)
+            features[:, 2] = self._scale(lexical)
+        return features
+
+    def rerank(
+        self,
+        snapshot: CatalogSnapshot,
+        user_vec: np.ndarray,
+        item_ids: list,
+        top_n: int,
+        candidates: Optional[np.ndarray] = None,
+        lexical_scores: Optional[np.ndarray] = None
+    ) -> list:
+        """Переоценивает товары первого этапа и возвращает id top_n лучших."""
+        positions = snapshot.positions(item_ids)
+        if not len(positions):
+            return []
+        scores = self.features(snapshot, user_vec, positions, candidates, lexical_scores) @ self.weights
+        return snapshot.ids[positions[top_k(scores, top_n)]].tolist()
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from services.recsys.catalog import CatalogSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "current.json"
+
+
+def publish_snapshot(snapshot: CatalogSnapshot, root: str, keep: int = 2) -> str:
+    """
+    Атомарно публикует снимок каталога в каталог root.
+
+    Массивы пишутся в новый подкаталог, после чего current.json
+    переключается на него. Старые подкаталоги удаляются (кроме keep последних):
+    процессы, уже отобразившие их файлы в память, продолжают их читать.
+
+    Возвращает:
+        str: Имя опубликованного подкаталога
+    """
+    os.makedirs(root, exist_ok=True)
+    name = f"v{time.time_ns()}"
+    tmp = os.path.join(root, f".{name}.tmp")
+    os.makedirs(tmp)
+
+    np.save(os.path.join(tmp, "ids.npy"), snapshot.ids)
+    np.save(os.path.join(tmp, "matrix.npy"), snapshot.matrix)
+    if snapshot.popularity is not None:
+        np.save(os.path.join(tmp, "popularity.npy"), snapshot.popularity)
+    if snapshot.lexical is not None:
+        snapshot.lexical.save(tmp)
+    os.rename(tmp, os.path.join(root, name))
+
+    version = None if snapshot.version is None else [str(v) for v in snapshot.version]
+    current = os.path.join(root, CURRENT_FILE)
+    with open(f"{current}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"name": name, "version": version}, f)
+    os.replace(f"{current}.tmp", current)
+
+    published = sorted(d for d in os.listdir(root) if d.startswith("v"))
+    for old in published[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+    logger.info(f"Снимок каталога опубликован: {name}, {len(snapshot)} товаров")
+    return name
+
+
+def load_published(root: str) -> Optional[Tuple[str, CatalogSnapshot]]:
+    """
+    Открывает опубликованный снимок, отображая массивы в память только для чтения.
+
+    Возвращает:
+        Tuple: имя подкаталога и снимок; None, если снимок ещё не опубликован
+    """
+    current = os.path.join(root, CURRENT_FILE)
+    if not os.path.exists(current):
+        return None
+    with open(current, encoding="utf-8") as f:
+        meta = json.load(f)
+
+    directory = os.path.join(root, meta["name"])
+    lexical = None
+    if os.path.exists(os.path.join(directory, "bm25_vocab.json")):
+        # Импорт здесь: lexical сам зависит от catalog
+        from services.recsys.lexical import BM25Index
+        lexical = BM25Index.load(directory)
+    popularity = None
+    if os.path.exists(os.path.join(directory, "popularity.npy")):
+        popularity = np.load(os.path.join(directory, "popularity.npy"), mmap_mode="r")
+
+    snapshot = CatalogSnapshot(
+        ids=np.load(os.path.join(directory, "ids.npy"), mmap_mode="r"),
+        matrix=np.load(os.path.join(directory, "matrix.npy"), mmap_mode="r"),
+        version=None if meta["version"] is None else tuple(meta["version"]),
+        lexical=lexical,
+        popularity=popularity
+    )
+    return meta["name"], snapshot
+
+
+class SharedCatalog:
+    """
+    Каталог товаров, опубликованный супервизором воркеров.
+
+    Повторяет интерфейс ItemCatalog, но читает не из БД, а из файлов,
+    отображённых в память: все процессы на узле используют одни и те же
+    страницы матрицы без копирования.
+    """
+
+    def __init__(self, root: str, refresh_interval: float = 5.0):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.snapshot = CatalogSnapshot()
+        self._name = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, session=None, force: bool = False) -> CatalogSnapshot:
+        """Переключается на новый снимок, если супервизор опубликовал его (session не используется)."""
+        if not force and time.monotonic() - self._checked_at < self.refresh_interval:
+            return self.snapshot
+
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                    name = json.load(f)["name"]
+                if force or name != self._name:
+                    published = load_published(self.root)
+                    if published is not None:
+                        self._name, self.snapshot = published
+                        logger.info(f"Подключен снимок каталога {self._name}: {len(self.snapshot)} товаров")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Не удалось открыть опубликованный каталог: {e}")
+        return self.snapshot
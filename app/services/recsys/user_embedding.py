@@ -0,0 +1,120 @@
+import sys
+import logging
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+from models.user import User
+from models.item import Item
+from models.interaction import Interaction
+from services.recsys.embedding import encode_embedding, decode_embedding
+from services.recsys.projection import UserProjector
+
+
+logger = logging.getLogger(__name__)
+
+
+def lock_user(user_id: int, session: Session) -> Optional[User]:
+    """Читает пользователя с блокировкой строки до конца транзакции (на Postgres)."""
+    statement = select(User).where(User.id == user_id).with_for_update()
+    return session.exec(statement).first()
+
+
+def projected_embedding(user: User, version: str) -> Optional[np.ndarray]:
+    """Сохранённая проекция пользователя, если она посчитана моделью версии version, иначе None."""
+    if user.embedding_proj is None or user.embedding_proj_version != version:
+        return None
+    return decode_embedding(user.embedding_proj)
+
+
+def apply_delta(
+    user: User,
+    delta: np.ndarray,
+    count_delta: int,
+    dtype: str = "float32",
+    projector: Optional[UserProjector] = None
+) -> None:
+    """
+    Прибавляет к сумме эмбеддингов пользователя delta, а к счётчику лайков — count_delta.
+
+    Хранятся сумма эмбеддингов лайкнутых товаров и их количество,
+    embedding пересчитывается как их отношение. Если передан projector,
+    вместе с embedding сохраняется его проекция (см. projected_embedding).
+    """
+    total = decode_embedding(user.embedding_sum) if user.embedding_sum is not None else np.zeros_like(delta)
+    _set_state(user, total + delta, max(user.likes_count + count_delta, 0), dtype, projector)
+
+
+def _set_state(user: User, total: np.ndarray, count: int, dtype: str, projector: Optional[UserProjector] = None) -> None:
+    user.likes_count = count
+    if count:
+        embedding = total / count
+        user.embedding_sum = encode_embedding(total, "float32")
+        user.embedding = encode_embedding(embedding, dtype)
+    else:
+        embedding = None
+        user.embedding_sum = None
+        user.embedding = None
+
+    # Без проектора прежняя проекция устарела — воркер посчитает её сам
+    if embedding is not None and projector is not None:
+        user.embedding_proj = encode_embedding(projector.project(embedding), "float32")
+        user.embedding_proj_version = projector.version
+    else:
+        user.embedding_proj = None
+        user.embedding_proj_version = None
+
+
+def rebuild_user_embeddings(
+    session: Session,
+    user_ids: Optional[Iterable[int]] = None,
+    dtype: str = "float32",
+    projector: Optional[UserProjector] = None
+) -> int:
+    """
+    Пересобирает сумму, счётчик, embedding и его проекцию по таблице Interaction.
+
+    Аргументы:
+        session: Сессия БД
+        user_ids: Пользователи для пересчёта (None — все)
+        dtype: Формат хранения embedding
+        projector: Проекция для embedding_proj (None — проекция сбрасывается)
+
+    Возвращает:
+        int: Количество обновлённых пользователей
+    """
+    statement = (
+        select(Interaction.user_id, Item.embedding)
+        .join(Item, Item.id == Interaction.item_id)
+        .where(Interaction.liked == True, Item.embedding != None)
+    )
+    users_statement = select(User)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        statement = statement.where(Interaction.user_id.in_(user_ids))
+        users_statement = users_statement.where(User.id.in_(user_ids))
+
+    sums, counts = {}, {}
+    for user_id, raw in session.exec(statement.execution_options(yield_per=5000)):
+        vec = decode_embedding(raw)
+        sums[user_id] = sums[user_id] + vec if user_id in sums else vec.copy()
+        counts[user_id] = counts.get(user_id, 0) + 1
+
+    users = session.exec(users_statement).all()
+    for user in users:
+        _set_state(user, sums.get(user.id), counts.get(user.id, 0), dtype, projector)
+        session.add(user)
+    session.commit()
+    logger.info("Эмбеддинги пользователей пересобраны: %d", len(users))
+    return len(users)
+
+
+if __name__ == "__main__":
+    from database.database import get_database_engine
+    from database.config import get_settings
+    from services.recsys.projection import get_user_projector
+
+    with Session(get_database_engine()) as session:
+        rebuild_user_embeddings(session, dtype=get_settings().EMBEDDING_DTYPE, projector=get_user_projector())
+    sys.exit(0)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class TaskNotifier:
+    """
+    Уведомления о завершении задач внутри процесса API.
+
+    Ожидающие запросы подписываются на id задачи и получают asyncio.Future
+    своего event loop. Получатели результатов (HTTP-колбэк, потребитель
+    очереди) вызывают notify из любого потока — future завершается
+    через call_soon_threadsafe, так что long-poll просыпается сразу,
+    без периодического опроса БД.
+    """
+
+    def __init__(self):
+        self._waiters = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self, task_id: int):
+        """Подписка на завершение задачи; вызывается внутри работающего event loop."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            self._waiters[task_id].add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(task_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[task_id]
+
+    def notify(self, task_id: int) -> None:
+        """Будит все запросы, ожидающие задачу task_id."""
+        with self._lock:
+            waiters = self._waiters.pop(task_id, ())
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_done, future)
+
+
+def _set_done(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+# Глобальный экземпляр для процесса API
+task_notifier = TaskNotifier()
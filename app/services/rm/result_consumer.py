@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+from typing import Optional
+
+import pika
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from services.rm.rmqconf import RabbitMQConfig
+from services.crud.recommendation_task import RecommendationTaskService
+from services.recsys.cache import recommendation_cache
+from services.rm.notifier import task_notifier
+from database.database import engine as default_engine
+from database.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResultConsumer:
+    """
+    Фоновый потребитель очереди результатов ML-воркеров.
+
+    Воркер публикует результат в очередь reply_to задачи (rpc_queue_name),
+    передавая id задачи в correlation_id. Потребитель собирает сообщения
+    в пачки и записывает их в БД одним коммитом, после чего подтверждает
+    всю пачку разом и будит запросы, ожидающие эти задачи.
+    Если БД недоступна, пачка возвращается в очередь после паузы
+    (растущей с каждой неудачей подряд); результат, который не удалось
+    записать MAX_DELIVERY_ATTEMPTS раз, отбрасывается.
+
+    Attributes:
+        config: Параметры подключения к RabbitMQ
+        engine: Движок БД для записи результатов
+        batch_size: Максимальный размер пачки
+        batch_timeout_ms: Максимальное ожидание добора пачки в миллисекундах
+    """
+
+    RETRY_DELAY = 5
+    FAILURE_BACKOFF = 0.5
+    MAX_DELIVERY_ATTEMPTS = 5
+
+    def __init__(
+        self,
+        config: Optional[RabbitMQConfig] = None,
+        engine: Optional[Engine] = None,
+        batch_size: int = 100,
+        batch_timeout_ms: int = 100
+    ):
+        self.config = config or RabbitMQConfig()
+        self.engine = engine or default_engine
+        self.batch_size = batch_size
+        self.batch_timeout_ms = batch_timeout_ms
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._attempts = {}
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="result-consumer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def run(self) -> None:
+        """Потребляет результаты, переподключаясь к RabbitMQ при обрывах."""
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = pika.BlockingConnection(self.config.get_connection_params())
+                self.consume(connection)
+            except Exception as e:
+                logger.error(f"Result consumer error: {e}")
+                self._stop.wait(self.RETRY_DELAY)
+            finally:
+                if connection and connection.is_open:
+                    connection.close()
+
+    def consume(self, connection) -> None:
+        channel = connection.channel()
+        channel.queue_declare(queue=self.config.rpc_queue_name, durable=True)
+        channel.basic_qos(prefetch_count=self.batch_size)
+
+        pending = []
+        channel.basic_consume(
+            queue=self.config.rpc_queue_name,
+            on_message_callback=lambda ch, method, properties, body: pending.append((method, properties, body)),
+            auto_ack=False
+        )
+        logger.info(f"Consuming results from {self.config.rpc_queue_name}")
+
+        batch_timeout = self.batch_timeout_ms / 1000
+        while not self._stop.is_set():
+            if not pending:
+                connection.process_data_events(time_limit=1)
+                continue
+
+            deadline = time.monotonic() + batch_timeout
+            while len(pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                connection.process_data_events(time_limit=remaining)
+
+            batch, pending[:] = pending[:self.batch_size], pending[self.batch_size:]
+            self.handle_batch(channel, batch)
+
+    def handle_batch(self, channel, messages: list) -> None:
+        """
+        Записывает пачку результатов в БД и подтверждает её.
+
+        Аргументы:
+            channel: Канал RabbitMQ
+            messages: Список кортежей (method, properties, body)
+
+        Некорректные сообщения отклоняются по одному, остальные
+        подтверждаются (или возвращаются) одним вызовом до наибольшего
+        из их delivery_tag: уже отклонённые теги в него не попадают.
+        Для каждой задачи хранятся теги всех её сообщений, включая дубликаты,
+        чтобы при отбрасывании задачи ни одно из них не осталось неподтверждённым.
+        """
+        results, tags = {}, {}
+        for method, properties, body in messages:
+            try:
+                task_id = int(properties.correlation_id)
+                results[task_id] = body.decode("utf-8")
+            except Exception as e:
+                logger.error(f"Malformed result message: {e}")
+                channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                continue
+            tags.setdefault(task_id, []).append(method.delivery_tag)
+
+        if not results:
+            return
+
+        try:
+            with Session(self.engine) as session:
+                RecommendationTaskService(session).set_results(results)
+        except Exception as e:
+            logger.error(f"Failed to save ML results: {e}")
+            self.retry_later(channel, tags)
+            return
+
+        self._failures = 0
+        for task_id, result in results.items():
+            self._attempts.pop(task_id, None)
+            recommendation_cache.resolve(task_id, result)
+            task_notifier.notify(task_id)
+        channel.basic_ack(delivery_tag=max(max(task_tags) for task_tags in tags.values()), multiple=True)
+        logger.info(f"ML results saved: {len(results)} tasks")
+
+    def retry_later(self, channel, tags: dict) -> None:
+        """
+        Возвращает в очередь результаты, которые не удалось записать.
+
+        tags сопоставляет id задачи со списком delivery_tag её сообщений:
+        теги отбрасываемых задач отклоняются по одному, остальные
+        возвращаются одним вызовом до наибольшего из них.
+
+        Перед возвратом выдерживается пауза, растущая с каждой неудачей подряд,
+        чтобы пачка не крутилась между брокером и потребителем без задержки.
+        """
+        self._failures += 1
+        self._stop.wait(min(self.FAILURE_BACKOFF * 2 ** (self._failures - 1), self.RETRY_DELAY))
+
+        retry = []
+        for task_id, task_tags in tags.items():
+            attempts = self._attempts.get(task_id, 0) + 1
+            if attempts >= self.MAX_DELIVERY_ATTEMPTS:
+                logger.error(f"Dropping result of task {task_id} after {attempts} failed attempts")
+                self._attempts.pop(task_id, None)
+                for tag in task_tags:
+                    channel.basic_nack(delivery_tag=tag, requeue=False)
+            else:
+                self._attempts[task_id] = attempts
+                retry.extend(task_tags)
+
+        if retry:
+            channel.basic_nack(delivery_tag=max(retry), multiple=True, requeue=True)
+
+
+settings = get_settings()
+# Глобальный потребитель результатов, запускается при старте приложения
+result_consumer = ResultConsumer(
+    batch_size=settings.RESULT_BATCH_SIZE,
+    batch_timeout_ms=settings.RESULT_BATCH_TIMEOUT_MS
+)
@@ -1,28 +1,48 @@
 import json
+import queue
 import pika
 import logging
+import threading
+from contextlib import contextmanager
 from typing import Optional
 from models.recommendation_task import RecommendationTask
+from database.config import get_settings
 
 # Устанавливаем уровень WARNING для логов pika
 logging.getLogger('pika').setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
 
 class RabbitMQClient:
     """
     Клиент для взаимодействия с RabbitMQ.
-    
+
+    Держит пул долгоживущих соединений (по каналу на соединение: соединения
+    pika не потокобезопасны), так что отправка задачи не требует
+    TCP- и AMQP-рукопожатия. Каналы работают в режиме publisher confirms:
+    отправка считается успешной, только когда брокер подтвердил сообщение.
+    Оборванное соединение пересоздаётся, а неотправленное сообщение
+    публикуется повторно.
+
     Attributes:
         connection_params: Параметры подключения к RabbitMQ серверу
         queue_name: Имя очереди для ML задач
+        reply_queue_name: Имя очереди, в которую воркеры публикуют результаты
+        pool_size: Максимальное количество одновременно открытых соединений
+        confirm_delivery: Включить publisher confirms
     """
-    
+
+    MAX_ATTEMPTS = 2
+
     def __init__(
         self,
         host: str = 'rabbitmq',
         port: int = 5672,
         username: str = 'rmuser',
         password: str = 'rmpassword',
-        queue_name: str = 'ml_task_queue'
+        queue_name: str = 'ml_task_queue',
+        reply_queue_name: str = 'rpc_queue',
+        pool_size: int = 4,
+        confirm_delivery: bool = True
     ):
         self.connection_params = pika.ConnectionParameters(
             host=host,
@@ -33,43 +53,102 @@ class RabbitMQClient:
             blocked_connection_timeout=2
         )
         self.queue_name = queue_name
+        self.reply_queue_name = reply_queue_name
+        self.pool_size = pool_size
+        self.confirm_delivery = confirm_delivery
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _open(self):
+        """Открывает соединение и канал, объявляет очередь задач один раз на соединение."""
+        connection = pika.BlockingConnection(self.connection_params)
+        channel = connection.channel()
+        if self.confirm_delivery:
+            channel.confirm_delivery()
+        channel.queue_declare(queue=self.queue_name)
+        return connection, channel
+
+    @staticmethod
+    def _close(connection) -> None:
+        try:
+            if connection.is_open:
+                connection.close()
+        except Exception as e:
+            logger.warning(f"Error closing RabbitMQ connection: {e}")
+
+    @contextmanager
+    def _channel(self):
+        """
+        Выдаёт канал из пула (или открывает новый) и возвращает его обратно.
+
+        Канал, на котором произошла ошибка, в пул не возвращается.
+        """
+        with self._slots:
+            try:
+                connection, channel = self._idle.get_nowait()
+            except queue.Empty:
+                connection, channel = self._open()
+            else:
+                try:
+                    # Обслуживаем heartbeat простаивавшего соединения и проверяем, что оно живо
+                    connection.process_data_events(time_limit=0)
+                    if not channel.is_open:
+                        raise pika.exceptions.ChannelClosed(0, "Channel is closed")
+                except Exception as e:
+                    logger.info(f"Reopening stale RabbitMQ connection: {e}")
+                    self._close(connection)
+                    connection, channel = self._open()
+
+            try:
+                yield channel
+            except Exception:
+                self._close(connection)
+                raise
+            self._idle.put((connection, channel))
 
     def send_task(self, task: RecommendationTask) -> bool:
         """
-        Отправляет ML задачу в очередь RabbitMQ.
-        
+        Отправляет ML задачу в очередь RabbitMQ по каналу из пула.
+
         Args:
             task: Объект MLTask для обработки
-            
+
         Returns:
-            bool: True если отправка прошла успешно, False в случае ошибки
-            
-        Raises:
-            pika.exceptions.AMQPError: При проблемах с подключением к RabbitMQ
+            bool: True если брокер подтвердил сообщение, False в случае ошибки
         """
-        try:
-            connection = pika.BlockingConnection(self.connection_params)
-            channel = connection.channel()
-            
-            # Создаем очередь если её нет
-            channel.queue_declare(queue=self.queue_name)
-            
-            # Подготавливаем сообщение
-            message = json.dumps(task.to_queue_message())
-            
-            # Отправляем сообщение
-            channel.basic_publish(
-                exchange='',
-                routing_key=self.queue_name,
-                body=message
-            )
-            
-            connection.close()
-            return True
-            
-        except pika.exceptions.AMQPError as e:
-            print(f"RabbitMQ error: {str(e)}")
-            return False
+        body = json.dumps(task.to_queue_message())
+        # Результат воркер вернёт в reply_to с тем же correlation_id
+        properties = pika.BasicProperties(
+            reply_to=self.reply_queue_name,
+            correlation_id=str(task.id)
+        )
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                with self._channel() as channel:
+                    channel.basic_publish(
+                        exchange='',
+                        routing_key=self.queue_name,
+                        body=body,
+                        properties=properties,
+                        mandatory=True
+                    )
+                return True
+            except pika.exceptions.AMQPError as e:
+                logger.error(f"RabbitMQ error (attempt {attempt}/{self.MAX_ATTEMPTS}): {e!r}")
+        return False
+
+    def close(self) -> None:
+        """Закрывает все простаивающие соединения пула."""
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(connection)
 
+settings = get_settings()
 # Создаем глобальный экземпляр клиента
-rabbit_client = RabbitMQClient()
+rabbit_client = RabbitMQClient(
+    pool_size=settings.RABBITMQ_POOL_SIZE,
+    confirm_delivery=settings.RABBITMQ_PUBLISH_CONFIRMS
+)
@@ -13,7 +13,7 @@ class RabbitMQConfig:
         username: Имя пользователя
         password: Пароль
         queue_name: Название основной очереди задач
-        rpc_queue_name: Название очереди для RPC-запросов
+        rpc_queue_name: Название очереди результатов (reply_to задач)
         heartbeat: Интервал проверки соединения в секундах
         connection_timeout: Таймаут подключения в секундах
     """
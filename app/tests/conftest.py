@@ -2,19 +2,27 @@ import pytest
 from fastapi.testclient import TestClient
 from api import app
 from sqlmodel import SQLModel, Session, create_engine
-from sqlalchemy.pool import StaticPool
-from database.database import get_session
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database.database import get_session, get_async_session
 from auth.authenticate import authenticate
 from models.user import User
 from auth.hash_password import HashPassword
+from services.recsys.cache import recommendation_cache
+
+
+@pytest.fixture(name="db_path")
+def db_path_fixture(tmp_path):
+    # Файловая БД: к ней подключаются и синхронная, и асинхронная сессии
+    return tmp_path / "test.db"
 
 
 @pytest.fixture(name="session")
-def session_fixture():
+def session_fixture(db_path):
     engine = create_engine(
-        "sqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False}
     )
     SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
@@ -39,7 +47,7 @@ def session_fixture():
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(session: Session, db_path):
     """
     Фикстура клиента с подменой зависимостей.
     """
@@ -47,14 +55,24 @@ def client_fixture(session: Session):
     def get_session_override():
         return session
 
+    # TestClient без контекстного менеджера запускает каждый запрос в своём event loop,
+    # поэтому асинхронные соединения не переиспользуются (NullPool)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
+
     # Подменяем authenticate на фиктивного пользователя
     def fake_authenticate():
         return "user@test.com"
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
     app.dependency_overrides[authenticate] = fake_authenticate
 
     client = TestClient(app)
     yield client
 
     app.dependency_overrides.clear()
+    recommendation_cache.clear()
@@ -1,7 +1,22 @@
+import time
 import pytest
 from fastapi.testclient import TestClient
 from models.user import UserCreate
-from sqlmodel import Session
+from sqlmodel import Session, select
+from models.user import User
+from models.item import Item
+from services.recsys.embedding import EMBEDDING_DIM, encode_embedding, decode_embedding
+from services.recsys.user_embedding import rebuild_user_embeddings
+from services.recsys.embedding_updater import EmbeddingUpdater, embedding_updater
+from models.interaction import Interaction, InteractionBulkItem
+from services.recsys.interaction_buffer import InteractionBuffer
+from unittest.mock import patch
+import numpy as np
+from passlib.context import CryptContext
+from database.config import get_settings
+from services.crud import user as UserService
+from sqlalchemy import inspect
+from sqlalchemy.exc import InvalidRequestError
 
 
 def test_health_check(client: TestClient):
@@ -42,6 +57,34 @@ def test_login(client: TestClient):
     assert response.json()["token_type"] == "bearer"
 
 
+def test_login_rehashes_outdated_password(client: TestClient, session: Session):
+    legacy = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    session.add(User(email="legacy@test.com", password=legacy.hash("1234test")))
+    session.commit()
+
+    response = client.post("/auth/token", data={"username": "legacy@test.com", "password": "1234test"})
+    assert response.status_code == 200
+
+    user = session.exec(select(User).where(User.email == "legacy@test.com")).first()
+    session.refresh(user)
+    assert user.password.startswith(f"$2b${get_settings().PASSWORD_HASH_ROUNDS:02d}$")
+
+    response = client.post("/auth/token", data={"username": "legacy@test.com", "password": "wrong"})
+    assert response.status_code == 401
+
+
+def test_user_loads_only_profile_columns(session: Session):
+    user = session.exec(select(User).where(User.email == "user@test.com")).first()
+    session.expunge_all()
+
+    loaded = UserService.get_users_by_ids([user.id], session)[0]
+    state = inspect(loaded)
+    # Связи и колонки вне профиля не читаются
+    assert {"interactions", "recommendation_tasks", "password", "embedding_sum"} & set(state.dict) == set()
+    with pytest.raises(InvalidRequestError):
+        loaded.password
+
+
 def test_get_all_users(client: TestClient):
     response = client.get("/api/users/")
     assert response.status_code == 200
@@ -80,3 +123,206 @@ def test_search_by_ids(client: TestClient, session: Session):
     data = response.json()
     assert isinstance(data, list)
     assert data[0]["title"] == "Test Product"
+
+
+def test_like_and_unlike_update_user_embedding(client: TestClient, session: Session, monkeypatch):
+    monkeypatch.setattr(embedding_updater, "engine", session.get_bind())
+    user = session.exec(select(User).where(User.email == "user@test.com")).first()
+    vectors = np.eye(2, EMBEDDING_DIM, dtype="float32")
+    items = [Item(title=f"item {i}", embedding=encode_embedding(vec)) for i, vec in enumerate(vectors)]
+    session.add_all(items)
+    session.commit()
+
+    for item in items:
+        response = client.post("/api/interaction/like", json={"user_id": user.id, "item_id": item.id})
+        assert response.status_code == 200
+    # Повторный лайк не учитывается дважды
+    client.post("/api/interaction/like", json={"user_id": user.id, "item_id": items[0].id})
+
+    # Эмбеддинг ещё не пересчитан: лайки ждут фонового обработчика
+    session.refresh(user)
+    assert user.likes_count == 0
+    embedding_updater.flush()
+
+    session.refresh(user)
+    assert user.likes_count == 2
+    assert np.allclose(decode_embedding(user.embedding), vectors.mean(axis=0))
+
+    response = client.post("/api/interaction/unlike", json={"user_id": user.id, "item_id": items[0].id})
+    assert response.status_code == 200
+    embedding_updater.flush()
+    session.refresh(user)
+    assert user.likes_count == 1
+    assert np.allclose(decode_embedding(user.embedding), vectors[1])
+
+    # Пересборка по Interaction даёт то же состояние
+    rebuild_user_embeddings(session, [user.id])
+    session.refresh(user)
+    assert user.likes_count == 1
+    assert np.allclose(decode_embedding(user.embedding), vectors[1])
+
+    response = client.post("/api/interaction/unlike", json={"user_id": user.id, "item_id": items[0].id})
+    assert response.status_code == 404
+
+
+def test_bulk_interactions_upsert_and_rebuild(client: TestClient, session: Session, monkeypatch):
+    monkeypatch.setattr(embedding_updater, "engine", session.get_bind())
+    user = session.exec(select(User).where(User.email == "user@test.com")).first()
+    vectors = np.eye(3, EMBEDDING_DIM, dtype="float32")
+    items = [Item(title=f"bulk {i}", embedding=encode_embedding(vec)) for i, vec in enumerate(vectors)]
+    session.add_all(items)
+    session.commit()
+
+    rows = [
+        {"user_id": user.id, "item_id": items[0].id},
+        {"user_id": user.id, "item_id": items[1].id},
+        # Дубликат: побеждает последняя строка
+        {"user_id": user.id, "item_id": items[1].id, "liked": False},
+        {"user_id": user.id, "item_id": items[2].id},
+        # Неизвестные пользователь и товар пропускаются
+        {"user_id": 9999, "item_id": items[0].id},
+        {"user_id": user.id, "item_id": 9999},
+    ]
+    response = client.post("/api/interaction/bulk", json={"interactions": rows})
+    assert response.status_code == 200
+    assert response.json()["users"] == 1
+
+    # Повторная загрузка обновляет существующие строки, а не падает на ключе
+    response = client.post("/api/interaction/bulk", json={"interactions": [
+        {"user_id": user.id, "item_id": items[2].id, "liked": False}
+    ]})
+    assert response.status_code == 200
+
+    embedding_updater.flush()
+    session.refresh(user)
+    assert user.likes_count == 1
+    assert np.allclose(decode_embedding(user.embedding), vectors[0])
+
+
+def test_embedding_updater_retries_failed_batch_as_rebuild(session: Session):
+    user = session.exec(select(User).where(User.email == "user@test.com")).first()
+    vectors = np.eye(2, EMBEDDING_DIM, dtype="float32")
+    items = [Item(title=f"retry {i}", embedding=encode_embedding(vec)) for i, vec in enumerate(vectors)]
+    session.add_all(items)
+    session.commit()
+    updater = EmbeddingUpdater(engine=session.get_bind())
+    updater.FAILURE_BACKOFF = 0
+
+    # Запись пачки падает: пользователь ставится на пересборку, а не теряется
+    session.add(Interaction(user_id=user.id, item_id=items[0].id))
+    session.commit()
+    updater.submit(user.id, items[0].id, 1)
+    with patch("services.recsys.embedding_updater.lock_user", side_effect=RuntimeError("db down")):
+        updater.flush()
+    session.refresh(user)
+    assert user.likes_count == 0
+
+    # Лайк пользователя с пересборкой в очереди уже учтён ею и дельтой не применяется
+    session.add(Interaction(user_id=user.id, item_id=items[1].id))
+    session.commit()
+    updater.submit(user.id, items[1].id, 1)
+    updater.flush()
+    session.refresh(user)
+    assert user.likes_count == 2
+    assert np.allclose(decode_embedding(user.embedding), vectors.mean(axis=0))
+
+
+def test_embedding_updater_failure_does_not_block_other_users(session: Session):
+    failing, other = [
+        session.exec(select(User).where(User.email == email)).first()
+        for email in ("user@test.com", "test_user@test.com")
+    ]
+    item = Item(title="backoff", embedding=encode_embedding(np.eye(1, EMBEDDING_DIM, dtype="float32")[0]))
+    session.add(item)
+    session.commit()
+    session.add_all([Interaction(user_id=user.id, item_id=item.id) for user in (failing, other)])
+    session.commit()
+    updater = EmbeddingUpdater(engine=session.get_bind())
+    updater.FAILURE_BACKOFF = 60
+
+    updater.submit(failing.id, item.id, 1)
+    with patch("services.recsys.embedding_updater.lock_user", side_effect=RuntimeError("db down")):
+        started = time.monotonic()
+        updater.flush()
+    assert time.monotonic() - started < updater.FAILURE_BACKOFF
+    assert set(updater._retry_at) == {failing.id}
+
+    # Пока повтор не наступил, события остальных пользователей обрабатываются сразу,
+    # а лайки отложенного пользователя учтёт его пересборка
+    updater.submit(other.id, item.id, 1)
+    updater.submit(failing.id, item.id, 1)
+    updater.flush()
+    session.refresh(other)
+    session.refresh(failing)
+    assert other.likes_count == 1
+    assert failing.likes_count == 0
+
+    updater._retry_at[failing.id] = time.monotonic()
+    updater.flush()
+    session.refresh(failing)
+    assert failing.likes_count == 1
+    assert not updater._retry_at and not updater._retry_failures
+
+
+def test_embedding_updater_like_during_rebuild_triggers_rebuild(session: Session):
+    user = session.exec(select(User).where(User.email == "user@test.com")).first()
+    item = Item(title="during rebuild", embedding=encode_embedding(np.eye(1, EMBEDDING_DIM, dtype="float32")[0]))
+    session.add(item)
+    session.commit()
+    updater = EmbeddingUpdater(engine=session.get_bind())
+
+    def rebuild_then_like(*args, **kwargs):
+        rebuild_user_embeddings(*args, **kwargs)
+        # Лайк закоммичен и отправлен, пока пересборка ещё не завершилась
+        with Session(session.get_bind()) as other:
+            other.add(Interaction(user_id=user.id, item_id=item.id))
+            other.commit()
+        updater.submit(user.id, item.id, 1)
+
+    updater.submit_rebuild([user.id])
+    with patch("services.recsys.embedding_updater.rebuild_user_embeddings", side_effect=rebuild_then_like):
+        updater.flush()
+    assert updater._queue.get_nowait() == (user.id, None, 0)
+
+
+def test_interaction_buffer_keeps_rows_after_failed_flush(session: Session, monkeypatch):
+    monkeypatch.setattr(embedding_updater, "engine", session.get_bind())
+    user = session.exec(select(User).where(User.email == "user@test.com")).first()
+    items = [Item(title=f"buffered {i}", embedding=encode_embedding(np.ones(EMBEDDING_DIM, dtype="float32"))) for i in range(2)]
+    session.add_all(items)
+    session.commit()
+    buffer = InteractionBuffer(engine=session.get_bind())
+
+    buffer.add(InteractionBulkItem(user_id=user.id, item_id=items[0].id))
+    with patch("services.recsys.interaction_buffer.upsert_interactions", side_effect=RuntimeError("db down")):
+        assert buffer.flush() == 0
+    assert session.exec(select(Interaction).where(Interaction.user_id == user.id)).all() == []
+
+    # Строки не потеряны и пишутся следующей записью вместе с новыми
+    buffer.add(InteractionBulkItem(user_id=user.id, item_id=items[1].id))
+    assert buffer.flush() == 2
+    liked = session.exec(select(Interaction.item_id).where(Interaction.user_id == user.id)).all()
+    assert sorted(liked) == [items[0].id, items[1].id]
+
+
+def test_buffered_like_rejects_unknown_user_or_item(client: TestClient, session: Session, monkeypatch):
+    monkeypatch.setattr(get_settings(), "LIKE_BUFFER_ENABLED", True)
+    monkeypatch.setattr(embedding_updater, "engine", session.get_bind())
+    buffer = InteractionBuffer(engine=session.get_bind())
+    monkeypatch.setattr("routes.interaction.interaction_buffer", buffer)
+    user = session.exec(select(User).where(User.email == "user@test.com")).first()
+    item = Item(title="buffered like")
+    session.add(item)
+    session.commit()
+
+    # Несуществующие пользователь или товар отклоняются сразу, а не теряются при записи буфера
+    response = client.post("/api/interaction/like", json={"user_id": 9999, "item_id": item.id})
+    assert response.status_code == 404
+    response = client.post("/api/interaction/like", json={"user_id": user.id, "item_id": 9999})
+    assert response.status_code == 404
+    assert buffer._rows == []
+
+    response = client.post("/api/interaction/like", json={"user_id": user.id, "item_id": item.id})
+    assert response.json() == {"message": "Like queued."}
+    assert buffer.flush() == 1
+    assert session.get(Interaction, (user.id, item.id)).liked
@@ -1,9 +1,30 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
-from sqlmodel import Session, select
+from sqlmodel import Session, create_engine, select
+from sqlalchemy import text
 from models.recommendation_task import RecommendationTask, TaskStatus
 from models.user import User
+from models.item import Item
+from api import app
+from routes.recommendation import get_recommender, wait_for_task
+from fastapi.concurrency import run_in_threadpool
+from services.recsys import online, projection
+from services.recsys.catalog import ItemCatalog
+from database.config import get_settings
+from services.recsys.embedding import EMBEDDING_DIM, encode_embedding
+from services.recsys.online import OnlineRecommender
+from services.recsys.popular import PopularItems
+from services.recsys.projection import UserProjector
+from services.rm.result_consumer import ResultConsumer
+from services.crud.recommendation_task import RecommendationTaskService
+from services.rm.notifier import task_notifier
+from services.rm.rm import RabbitMQClient
+import pika
+from types import SimpleNamespace
+import asyncio
+import threading
+import numpy as np
 
 
 @pytest.fixture
@@ -19,7 +40,7 @@ def test_create_recommendation_task(client: TestClient, test_user: User, session
 
     # Мокаем отправку задачи в очередь
     with patch("services.rm.rm.rabbit_client.send_task") as mock_send_task:
-        mock_send_task.return_value = None
+        mock_send_task.return_value = True
 
         response = client.post("/api/recommendation/", json=task_payload)
         assert response.status_code == 201
@@ -34,6 +55,15 @@ def test_create_recommendation_task(client: TestClient, test_user: User, session
         assert db_task.status == TaskStatus.QUEUED
 
 
+def test_create_recommendation_task_broker_unavailable(client: TestClient, test_user: User, session: Session):
+    with patch("services.rm.rm.rabbit_client.send_task", return_value=False):
+        response = client.post("/api/recommendation/", json={"user_id": test_user.id, "top_n": 5})
+    assert response.status_code == 503
+
+    task = session.exec(select(RecommendationTask).where(RecommendationTask.user_id == test_user.id)).one()
+    assert task.status == TaskStatus.FAILED
+
+
 def test_receive_ml_result(client: TestClient, test_user: User, session: Session):
     # Создаем задание
     task = RecommendationTask(user_id=test_user.id, top_n=5, status=TaskStatus.QUEUED)
@@ -50,3 +80,262 @@ def test_receive_ml_result(client: TestClient, test_user: User, session: Session
     updated_task = session.get(RecommendationTask, task.id)
     assert updated_task.status == TaskStatus.COMPLETED
     assert updated_task.result == "[1, 2, 3, 4, 5]"
+
+
+def test_recommendation_served_from_cache(client: TestClient, test_user: User, session: Session):
+    task_payload = {"user_id": test_user.id, "top_n": 5, "query": "Green Tea"}
+
+    with patch("services.rm.rm.rabbit_client.send_task", return_value=True) as mock_send_task:
+        task_id = client.post("/api/recommendation/", json=task_payload).json()["id"]
+        client.post("/api/recommendation/send_task_result", params={"task_id": task_id, "result": "[7, 8]"})
+
+        # Тот же запрос (с точностью до регистра и пробелов) отдаётся из кэша
+        task_payload["query"] = " green  tea"
+        response = client.post("/api/recommendation/", json=task_payload)
+        assert response.status_code == 201
+        assert response.json()["status"] == "completed"
+        assert response.json()["result"] == "[7, 8]"
+        assert mock_send_task.call_count == 1
+
+
+def test_recommend_now(client: TestClient, test_user: User, session: Session):
+    vectors = np.eye(3, EMBEDDING_DIM, dtype="float32")
+    for i, vec in enumerate(vectors):
+        session.add(Item(title=f"item {i}", embedding=encode_embedding(vec), embedding_proj=encode_embedding(vec)))
+    test_user.embedding = encode_embedding(vectors[2] + 0.5 * vectors[0])
+    session.add(test_user)
+    session.commit()
+
+    projector = UserProjector(np.eye(EMBEDDING_DIM), np.zeros(EMBEDDING_DIM))
+    app.dependency_overrides[get_recommender] = lambda: OnlineRecommender(projector, ItemCatalog())
+
+    response = client.get("/api/recommendation/now", params={"user_id": test_user.id, "top_n": 2})
+    assert response.status_code == 200
+    item_ids = response.json()["item_ids"]
+    assert [session.get(Item, i).title for i in item_ids] == ["item 2", "item 0"]
+
+    response = client.get("/api/recommendation/now", params={"user_id": 999})
+    assert response.status_code == 404
+
+
+def test_recommend_now_unavailable_without_model_export(client: TestClient, test_user: User, tmp_path, monkeypatch):
+    monkeypatch.setattr(online, "_recommender", None)
+    monkeypatch.setattr(projection, "_projector", None)
+    monkeypatch.setattr(get_settings(), "MODEL_WEIGHTS_PATH", str(tmp_path / "missing.npz"))
+
+    response = client.get("/api/recommendation/now", params={"user_id": test_user.id})
+    assert response.status_code == 503
+
+
+def test_popular_items_served_from_memory(session: Session):
+    vec = encode_embedding(np.ones(EMBEDDING_DIM, dtype="float32"))
+    items = [Item(title=f"tea {i}" if i % 2 else f"coffee {i}", embedding=vec, popularity_score=i) for i in range(6)]
+    session.add_all(items)
+    session.commit()
+    ids = [item.id for item in items]
+
+    popular = PopularItems(top_k=3, refresh_interval=0)
+    assert popular.get(session, 2) == [ids[5], ids[4]]
+    assert popular.get(session, 5, "TEA ") == [ids[5], ids[3], ids[1]]
+
+    # Повторные запросы не ходят в БД за списком, пока популярность не изменилась
+    with patch.object(popular, "_ranked", side_effect=AssertionError):
+        assert popular.get(session, 3) == [ids[5], ids[4], ids[3]]
+        assert popular.get(session, 2, "tea") == [ids[5], ids[3]]
+
+    items[0].popularity_score = 100
+    session.add(items[0])
+    session.commit()
+    assert popular.get(session, 1) == [ids[0]]
+    assert popular.get(session, 1, "coffee") == [ids[0]]
+
+
+def test_catalog_version_tracks_in_place_updates(session: Session):
+    vectors = np.eye(2, EMBEDDING_DIM, dtype="float32")
+    items = [Item(title=f"item {i}", embedding=encode_embedding(vec), embedding_proj=encode_embedding(vec)) for i, vec in enumerate(vectors)]
+    session.add_all(items)
+    session.commit()
+    catalog = ItemCatalog(refresh_interval=0)
+    first = catalog.refresh(session)
+
+    # Проекция товара заменена на месте: количество и id не изменились
+    items[0].embedding_proj = encode_embedding(vectors[1])
+    session.add(items[0])
+    session.commit()
+    second = catalog.refresh(session)
+    assert second.version != first.version
+    assert np.array_equal(second.matrix[0], vectors[1])
+
+    # Популярность обновлена прямым SQL, в обход ORM
+    session.exec(text("UPDATE item SET popularity_score = popularity_score + 5"))
+    session.commit()
+    third = catalog.refresh(session)
+    assert third.version != second.version
+    assert third.popularity.tolist() == [5, 5]
+
+
+def test_result_consumer_saves_batch(test_user: User, session: Session):
+    tasks = [RecommendationTask(user_id=test_user.id, top_n=5, status=TaskStatus.QUEUED) for _ in range(2)]
+    session.add_all(tasks)
+    session.commit()
+
+    class FakeChannel:
+        def __init__(self):
+            self.acks, self.nacks = [], []
+
+        def basic_ack(self, delivery_tag, multiple=False):
+            self.acks.append((delivery_tag, multiple))
+
+        def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+            self.nacks.append((delivery_tag, requeue))
+
+    messages = [
+        (SimpleNamespace(delivery_tag=1), SimpleNamespace(correlation_id=str(tasks[0].id)), b"[1, 2]"),
+        (SimpleNamespace(delivery_tag=2), SimpleNamespace(correlation_id=str(tasks[1].id)), b"[4]"),
+        # Последнее сообщение некорректно: пачка подтверждается до тега 2, а не 3
+        (SimpleNamespace(delivery_tag=3), SimpleNamespace(correlation_id=None), b"[3]"),
+    ]
+    channel = FakeChannel()
+    ResultConsumer(engine=session.get_bind()).handle_batch(channel, messages)
+
+    assert channel.nacks == [(3, False)]
+    assert channel.acks == [(2, True)]
+    session.expire_all()
+    assert [(t.status, t.result) for t in tasks] == [(TaskStatus.COMPLETED, "[1, 2]"), (TaskStatus.COMPLETED, "[4]")]
+
+    # БД недоступна: результаты возвращаются в очередь, пока не исчерпан лимит попыток
+    consumer = ResultConsumer(engine=session.get_bind())
+    consumer.FAILURE_BACKOFF = 0
+    consumer.MAX_DELIVERY_ATTEMPTS = 2
+    messages = [
+        (SimpleNamespace(delivery_tag=4), SimpleNamespace(correlation_id=str(tasks[0].id)), b"[5]"),
+        (SimpleNamespace(delivery_tag=5), SimpleNamespace(correlation_id=None), b"[6]"),
+    ]
+    channel = FakeChannel()
+    with patch.object(RecommendationTaskService, "set_results", side_effect=RuntimeError("db down")):
+        consumer.handle_batch(channel, messages)
+        consumer.handle_batch(channel, messages)
+    assert channel.nacks == [(5, False), (4, True), (5, False), (4, False)]
+    assert channel.acks == []
+
+    # Дубликаты результата отбрасываемой задачи отклоняются все, а не только наибольший тег
+    consumer._attempts[tasks[0].id] = 1
+    messages = [
+        (SimpleNamespace(delivery_tag=6), SimpleNamespace(correlation_id=str(tasks[0].id)), b"[7]"),
+        (SimpleNamespace(delivery_tag=7), SimpleNamespace(correlation_id=str(tasks[1].id)), b"[8]"),
+        (SimpleNamespace(delivery_tag=8), SimpleNamespace(correlation_id=str(tasks[0].id)), b"[7]"),
+    ]
+    channel = FakeChannel()
+    with patch.object(RecommendationTaskService, "set_results", side_effect=RuntimeError("db down")):
+        consumer.handle_batch(channel, messages)
+    assert channel.nacks == [(6, False), (8, False), (7, True)]
+
+
+def test_wait_for_task(client: TestClient, test_user: User, session: Session):
+    task = RecommendationTask(user_id=test_user.id, top_n=5, status=TaskStatus.QUEUED)
+    session.add(task)
+    session.commit()
+    session.refresh(task)
+
+    # Незавершённая задача возвращается по истечении timeout
+    response = client.get(f"/api/recommendation/{task.id}/wait", params={"timeout": 0.1})
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+
+    client.post("/api/recommendation/send_task_result", params={"task_id": task.id, "result": "[1]"})
+    response = client.get(f"/api/recommendation/{task.id}/wait", params={"timeout": 5})
+    assert response.json()["result"] == "[1]"
+
+    assert client.get("/api/recommendation/999/wait").status_code == 404
+
+
+def test_waiters_do_not_hold_pool_connections(db_path, test_user: User, session: Session):
+    # Ожидающих больше, чем соединений в пуле
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        pool_size=2,
+        max_overflow=0,
+        pool_timeout=1,
+        connect_args={"check_same_thread": False}
+    )
+    tasks = [RecommendationTask(user_id=test_user.id, top_n=5, status=TaskStatus.QUEUED) for _ in range(6)]
+    session.add_all(tasks)
+    session.commit()
+    task_ids = [task.id for task in tasks]
+
+    def complete():
+        with Session(engine) as other:
+            RecommendationTaskService(other).set_results({task_id: "[1]" for task_id in task_ids})
+
+    async def wait_all():
+        waiters = [
+            asyncio.create_task(wait_for_task(
+                task_id, timeout=5, task_service=RecommendationTaskService(Session(engine)), user_email="user@test.com"
+            ))
+            for task_id in task_ids
+        ]
+        await asyncio.sleep(0.3)
+        await run_in_threadpool(complete)
+        for task_id in task_ids:
+            task_notifier.notify(task_id)
+        return await asyncio.gather(*waiters)
+
+    assert [task.result for task in asyncio.run(wait_all())] == ["[1]"] * len(task_ids)
+    engine.dispose()
+
+
+def test_task_notifier_wakes_waiter_from_other_thread():
+    async def wait():
+        with task_notifier.subscribe(42) as done:
+            threading.Timer(0.05, task_notifier.notify, args=(42,)).start()
+            await asyncio.wait_for(done, 5)
+
+    asyncio.run(wait())
+
+
+class FakeBlockingConnection:
+    opened = []
+
+    def __init__(self, params):
+        self.is_open = True
+        self.published = []
+        self.fail_next = False
+        FakeBlockingConnection.opened.append(self)
+
+    def channel(self):
+        return self
+
+    def confirm_delivery(self):
+        self.confirms = True
+
+    def queue_declare(self, queue):
+        pass
+
+    def process_data_events(self, time_limit=None):
+        pass
+
+    def basic_publish(self, exchange, routing_key, body, properties, mandatory):
+        if self.fail_next:
+            raise pika.exceptions.StreamLostError("connection lost")
+        self.published.append((routing_key, properties.correlation_id))
+
+    def close(self):
+        self.is_open = False
+
+
+def test_rabbitmq_client_reuses_and_reopens_connections():
+    FakeBlockingConnection.opened = []
+    client = RabbitMQClient(pool_size=2)
+    tasks = [RecommendationTask(id=i, user_id=1) for i in range(3)]
+
+    with patch("services.rm.rm.pika.BlockingConnection", FakeBlockingConnection):
+        assert client.send_task(tasks[0])
+        assert client.send_task(tasks[1])
+        assert len(FakeBlockingConnection.opened) == 1
+        assert FakeBlockingConnection.opened[0].confirms
+
+        # Оборванное соединение пересоздаётся, задача отправляется повторно
+        FakeBlockingConnection.opened[0].fail_next = True
+        assert client.send_task(tasks[2])
+        assert len(FakeBlockingConnection.opened) == 2
+        assert FakeBlockingConnection.opened[1].published == [("ml_task_queue", "2")]
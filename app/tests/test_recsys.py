@@ -0,0 +1,177 @@
+import numpy as np
+import pytest
+from database.config import get_settings
+from services.recsys import projection
+from services.recsys.embedding_updater import EmbeddingUpdater
+from services.recsys.catalog import CatalogSnapshot, top_k
+from services.recsys.lexical import BM25Index
+from services.recsys.embedding import EMBEDDING_DIM, encode_embedding, decode_embedding
+from services.recsys.cache import RecommendationCache
+from services.recsys.projection import UserProjector
+from services.recsys.rerank import Reranker
+from services.recsys.shared import SharedCatalog, publish_snapshot
+from services.recsys.user_embedding import apply_delta, projected_embedding
+from models.user import User
+
+
+def test_top_k_matches_full_sort():
+    scores = np.random.default_rng(0).normal(size=(3, 100)).astype("float32")
+    expected = np.argsort(-scores, axis=1)[:, :5]
+    assert (top_k(scores, 5) == expected).all()
+
+
+def test_snapshot_positions_skip_unknown_ids():
+    snapshot = CatalogSnapshot(ids=np.array([2, 5, 9]), matrix=np.eye(3, dtype="float32"))
+    assert snapshot.positions([9, 3, 2, 100]).tolist() == [2, 0]
+
+
+def test_bm25_prefers_documents_with_all_terms():
+    index = BM25Index.build([
+        ("Green Tea", "organic green tea leaves"),
+        ("Black tea", None),
+        ("Green apple", "fresh"),
+    ])
+    positions, scores = index.search("green tea")
+    assert positions.tolist() == [0]
+
+    positions, scores = index.search("green banana")
+    assert sorted(positions.tolist()) == [0, 2]
+    assert (np.diff(scores) <= 0).all()
+
+
+def test_reranker_combines_dot_popularity_and_lexical():
+    snapshot = CatalogSnapshot(
+        ids=np.array([10, 20, 30]),
+        matrix=np.eye(3, dtype="float32"),
+        popularity=np.array([0, 1000, 0], dtype="float32")
+    )
+    user_vec = np.array([1.0, 0.9, 0.0], dtype="float32")
+
+    # Без популярности и запроса порядок задаёт скалярное произведение
+    assert Reranker(popularity_weight=0).rerank(snapshot, user_vec, [30, 20, 10], 2) == [10, 20]
+    assert Reranker(popularity_weight=0.5).rerank(snapshot, user_vec, [30, 20, 10], 2) == [20, 10]
+
+    # BM25-скоры сопоставляются кандидатам запроса по номеру строки
+    reranker = Reranker(popularity_weight=0, lexical_weight=2)
+    ranked = reranker.rerank(snapshot, user_vec, [10, 20, 30], 3, np.array([2, 0]), np.array([5.0, 1.0]))
+    assert ranked == [30, 10, 20]
+
+
+def test_embedding_roundtrip_float32_and_float16():
+    vec = np.random.default_rng(1).normal(size=EMBEDDING_DIM).astype("float32")
+
+    restored = decode_embedding(encode_embedding(vec))
+    assert restored.dtype == np.float32
+    assert np.array_equal(restored, vec)
+
+    half = encode_embedding(vec, "float16")
+    assert len(half) == EMBEDDING_DIM * 2
+    assert np.allclose(decode_embedding(half), vec, atol=1e-2)
+
+
+def test_recommendation_cache_eviction_and_invalidation():
+    cache = RecommendationCache(max_entries=2, ttl=60)
+    keys = [cache.make_key(user_id, 10, None) for user_id in (1, 2, 3)]
+    for task_id, key in enumerate(keys):
+        cache.track(task_id, key)
+        cache.resolve(task_id, f"[{task_id}]")
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == "[2]"
+
+    cache.track(10, cache.make_key(3, 5, None))
+    cache.invalidate_user(3)
+    cache.resolve(10, "[stale]")
+    assert cache.get(cache.make_key(3, 10, None)) is None
+    assert cache.get(cache.make_key(3, 5, None)) is None
+
+
+def test_recommendation_cache_versions_are_bounded():
+    cache = RecommendationCache(max_entries=2, ttl=60)
+    stale = cache.make_key(1, 10, None)
+    cache.invalidate_user(1)
+    fresh = cache.make_key(1, 10, None)
+    cache.track(1, fresh)
+    cache.resolve(1, "[1]")
+    assert cache.get(cache.make_key(1, 10, None)) == "[1]"
+    assert fresh != stale
+
+    # Версия пользователя 1 вытеснена: его ключи не совпадают ни с прежними, ни с новыми
+    cache.invalidate_user(2)
+    cache.invalidate_user(3)
+    assert len(cache._versions) == 2
+    assert cache.make_key(1, 10, None) not in (stale, fresh)
+    assert cache.get(cache.make_key(1, 10, None)) is None
+
+
+def test_user_projector_normalizes_projection():
+    rng = np.random.default_rng(2)
+    weight, bias = rng.normal(size=(4, 4)), rng.normal(size=4)
+    users = rng.normal(size=(3, 4))
+
+    projected = UserProjector(weight, bias).project(users)
+    expected = users @ weight.T + bias
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    assert np.allclose(projected, expected, atol=1e-5)
+
+
+def test_user_projector_npz_export_roundtrip(tmp_path):
+    rng = np.random.default_rng(4)
+    projector = UserProjector(rng.normal(size=(4, 4)), rng.normal(size=4))
+    path = str(tmp_path / "user_projection.npz")
+    projector.save(path)
+
+    loaded = UserProjector.from_npz(path)
+    users = rng.normal(size=(3, 4))
+    assert loaded.version == projector.version
+    assert np.array_equal(loaded.project(users), projector.project(users))
+
+
+def test_user_projector_requires_npz_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(projection, "_projector", None)
+    monkeypatch.setattr(get_settings(), "MODEL_WEIGHTS_PATH", str(tmp_path / "missing.npz"))
+    with pytest.raises(FileNotFoundError, match="export_model.py"):
+        projection.get_user_projector()
+
+    UserProjector(np.eye(4), np.zeros(4)).save(str(tmp_path / "missing.npz"))
+    assert projection.get_user_projector().weight_t.shape == (4, 4)
+
+
+def test_embedding_updater_picks_up_projector_when_export_appears(tmp_path, monkeypatch):
+    monkeypatch.setattr(projection, "_projector", None)
+    monkeypatch.setattr(get_settings(), "MODEL_WEIGHTS_PATH", str(tmp_path / "user_projection.npz"))
+    updater = EmbeddingUpdater(engine=object())
+    updater.PROJECTOR_RETRY_SECONDS = 0
+
+    # Пока экспорта нет, проекции пропускаются, а не отключаются навсегда
+    assert updater.projector() is None
+    UserProjector(np.eye(4), np.zeros(4)).save(str(tmp_path / "user_projection.npz"))
+    assert updater.projector() is projection.get_user_projector()
+
+
+def test_stored_user_projection_is_versioned_by_model():
+    rng = np.random.default_rng(3)
+    shape = (EMBEDDING_DIM, EMBEDDING_DIM)
+    projector = UserProjector(rng.normal(size=shape), rng.normal(size=EMBEDDING_DIM))
+    other = UserProjector(rng.normal(size=shape), rng.normal(size=EMBEDDING_DIM))
+    user = User(email="p@test.com", password="test")
+    delta = rng.normal(size=EMBEDDING_DIM).astype("float32")
+
+    apply_delta(user, delta, 1, projector=projector)
+    assert np.allclose(projected_embedding(user, projector.version), projector.project(delta), atol=1e-6)
+    assert projected_embedding(user, other.version) is None
+
+    # Без проектора устаревшая проекция сбрасывается
+    apply_delta(user, delta, 1)
+    assert projected_embedding(user, projector.version) is None
+
+
+def test_shared_catalog_maps_published_snapshot(tmp_path):
+    lexical = BM25Index.build([("green tea", None), ("black coffee", None)])
+    snapshot = CatalogSnapshot(ids=np.array([3, 7]), matrix=np.eye(2, dtype="float32"), version=(2, 7), lexical=lexical)
+    publish_snapshot(snapshot, str(tmp_path))
+
+    shared = SharedCatalog(str(tmp_path)).refresh()
+    assert isinstance(shared.matrix, np.memmap)
+    assert shared.ids.tolist() == [3, 7]
+    assert shared.version == ("2", "7")
+    assert shared.lexical.search("coffee")[0].tolist() == [1]
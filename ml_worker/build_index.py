@@ -0,0 +1,44 @@
+import sys
+import logging
+import argparse
+from sqlmodel import Session
+
+from models import user, item, interaction, recommendation_task
+
+from database.database import get_database_engine
+from database.config import get_settings
+from services.recsys.catalog import ItemCatalog
+from indexing.faiss_index import IndexConfig, ItemIndex, INDEX_TYPES
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main() -> int:
+    """Строит FAISS-индекс по Item.embedding_proj и сохраняет его на диск."""
+    config = IndexConfig.from_settings(get_settings())
+
+    parser = argparse.ArgumentParser(description="Построение FAISS-индекса товаров")
+    parser.add_argument("--type", choices=INDEX_TYPES, default=config.index_type, help="Тип индекса")
+    parser.add_argument("--path", default=config.path, help="Путь для сохранения индекса")
+    args = parser.parse_args()
+
+    config.index_type = args.type
+    config.path = args.path
+
+    with Session(get_database_engine()) as session:
+        snapshot = ItemCatalog().load(session)
+    if not len(snapshot):
+        logger.error("В каталоге нет товаров с эмбеддингами")
+        return 1
+
+    ItemIndex.build(snapshot, config).save()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import sys
+import logging
+import argparse
+
+from database.config import get_settings
+from services.recsys.projection import UserProjector
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main() -> int:
+    """Экспортирует веса user_projection из чекпоинта .pth в .npz для инференса без torch."""
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(description="Экспорт весов модели в .npz")
+    parser.add_argument("--checkpoint", default=settings.MODEL_PATH, help="Чекпоинт ContrastiveDotModel (.pth)")
+    parser.add_argument("--out", default=settings.MODEL_WEIGHTS_PATH, help="Путь для сохранения .npz")
+    args = parser.parse_args()
+
+    projector = UserProjector.from_checkpoint(args.checkpoint)
+    projector.save(args.out)
+    logger.info(f"Веса сохранены в {args.out}, версия модели {projector.version}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
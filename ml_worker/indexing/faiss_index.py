@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple
+
+import numpy as np
+import faiss
+
+from services.recsys.catalog import CatalogSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+
+@dataclass
+class IndexConfig:
+    """
+    Параметры FAISS-индекса товаров.
+
+    Атрибуты:
+        index_type: Тип индекса: flat (точный), ivf или hnsw
+        path: Путь к файлу индекса (рядом сохраняются id и метаданные)
+        ivf_nlist: Количество кластеров IVF
+        ivf_nprobe: Количество просматриваемых кластеров при поиске
+        hnsw_m: Количество связей вершины графа HNSW
+        hnsw_ef_construction: Ширина поиска при построении HNSW
+        hnsw_ef_search: Ширина поиска HNSW при запросе
+        mmap: Отображать файл индекса в память вместо чтения (общие страницы между процессами)
+    """
+    index_type: str = "flat"
+    path: str = "ml_models/items.faiss"
+    ivf_nlist: int = 1024
+    ivf_nprobe: int = 16
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 200
+    hnsw_ef_search: int = 64
+    mmap: bool = False
+
+    def __post_init__(self):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Неизвестный тип индекса: {self.index_type}, ожидается один из {INDEX_TYPES}")
+
+    @classmethod
+    def from_settings(cls, settings) -> "IndexConfig":
+        return cls(
+            index_type=settings.INDEX_TYPE,
+            path=settings.INDEX_PATH,
+            ivf_nlist=settings.INDEX_IVF_NLIST,
+            ivf_nprobe=settings.INDEX_IVF_NPROBE,
+            hnsw_m=settings.INDEX_HNSW_M,
+            hnsw_ef_construction=settings.INDEX_HNSW_EF_CONSTRUCTION,
+            hnsw_ef_search=settings.INDEX_HNSW_EF_SEARCH,
+        )
+
+
+def _version_key(version: Optional[Tuple]) -> Optional[list]:
+    """Приводит маркер версии каталога к JSON-совместимому виду."""
+    return None if version is None else [str(v) for v in version]
+
+
+def _mmap_flag(index_type: str) -> int:
+    """
+    Флаг чтения индекса с отображением в память.
+
+    IVF отображает инвертированные списки, flat/HNSW — хранилище векторов
+    (IO_FLAG_MMAP_IFC, есть не во всех сборках FAISS). Без него индекс
+    читается в память каждого процесса целиком, о чём пишется предупреждение.
+    """
+    if index_type == "ivf":
+        return faiss.IO_FLAG_MMAP
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        return faiss.IO_FLAG_MMAP_IFC
+    logger.warning(
+        f"Сборка FAISS {faiss.__version__} не поддерживает IO_FLAG_MMAP_IFC: "
+        f"индекс {index_type} загружается в память процесса целиком"
+    )
+    return 0
+
+
+class ItemIndex:
+    """
+    Предпостроенный FAISS-индекс по проекциям товаров с отображением в id.
+
+    Метки векторов в индексе — номера строк снимка каталога,
+    ids переводит их обратно в id товаров.
+    """
+
+    def __init__(self, index: faiss.Index, ids: np.ndarray, config: IndexConfig, version: Optional[list]):
+        self.index = index
+        self.ids = ids
+        self.config = config
+        self.version = version
+        self._apply_search_params()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _apply_search_params(self) -> None:
+        if self.config.index_type == "ivf":
+            faiss.extract_index_ivf(self.index).nprobe = self.config.ivf_nprobe
+        elif self.config.index_type == "hnsw":
+            self.index.hnsw.efSearch = self.config.hnsw_ef_search
+
+    def matches(self, snapshot: CatalogSnapshot, config: IndexConfig) -> bool:
+        """Проверяет, что индекс построен по этой версии каталога и с тем же типом."""
+        return self.version == _version_key(snapshot.version) and self.config.index_type == config.index_type
+
+    @classmethod
+    def build(cls, snapshot: CatalogSnapshot, config: IndexConfig) -> "ItemIndex":
+        """Строит индекс по матрице снимка каталога."""
+        started = time.perf_counter()
+        matrix = snapshot.matrix
+        n, dim = matrix.shape
+
+        if config.index_type == "ivf":
+            nlist = max(1, min(config.ivf_nlist, n // 39))
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+        elif config.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = config.hnsw_ef_construction
+        else:
+            index = faiss.IndexFlatIP(dim)
+        index.add(matrix)
+
+        logger.info(
+            "FAISS-индекс %s построен: %d векторов, %.2f с",
+            config.index_type, n, time.perf_counter() - started
+        )
+        return cls(index, snapshot.ids.copy(), config, _version_key(snapshot.version))
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Атомарно сохраняет индекс, id и метаданные на диск."""
+        path = path or self.config.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        suffix = f".tmp{os.getpid()}"
+
+        faiss.write_index(self.index, path + suffix)
+        with open(f"{path}.ids.npy{suffix}", "wb") as f:
+            np.save(f, self.ids)
+        with open(f"{path}.meta.json{suffix}", "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "config": asdict(self.config)}, f)
+
+        # Метаданные заменяются последними: по ним проверяется актуальность
+        os.replace(path + suffix, path)
+        os.replace(f"{path}.ids.npy{suffix}", f"{path}.ids.npy")
+        os.replace(f"{path}.meta.json{suffix}", f"{path}.meta.json")
+        logger.info(f"FAISS-индекс сохранён: {path}")
+
+    @classmethod
+    def load(cls, config: IndexConfig) -> Optional["ItemIndex"]:
+        """Загружает индекс с диска; None, если файлов нет или тип не совпадает."""
+        path = config.path
+        if not all(os.path.exists(p) for p in (path, f"{path}.ids.npy", f"{path}.meta.json")):
+            return None
+
+        with open(f"{path}.meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["config"]["index_type"] != config.index_type:
+            logger.info(f"Тип индекса на диске {meta['config']['index_type']} не совпадает с {config.index_type}")
+            return None
+
+        flags = _mmap_flag(config.index_type) if config.mmap else 0
+        index = faiss.read_index(path, flags)
+        ids = np.load(f"{path}.ids.npy")
+        logger.info(f"FAISS-индекс {config.index_type} загружен с диска: {len(ids)} векторов")
+        return cls(index, ids, config, meta["version"])
+
+    @classmethod
+    def load_or_build(cls, snapshot: CatalogSnapshot, config: IndexConfig) -> "ItemIndex":
+        """Берёт индекс с диска, если он соответствует каталогу, иначе строит и сохраняет новый."""
+        index = cls.load(config)
+        if index is not None and index.matches(snapshot, config):
+            return index
+
+        index = cls.build(snapshot, config)
+        try:
+            index.save()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить FAISS-индекс: {e}")
+        return index
+
+    def _selector(self, positions: np.ndarray):
+        """
+        Селектор, ограничивающий поиск заданными строками индекса.
+
+        Плотные наборы передаются битовой маской, разреженные — хеш-набором id.
+        """
+        n = len(self.ids)
+        if len(positions) * 64 > n:
+            mask = np.zeros(n, dtype=bool)
+            mask[positions] = True
+            bits = np.packbits(mask, bitorder="little")
+            return faiss.IDSelectorBitmap(n, faiss.swig_ptr(bits)), bits
+        return faiss.IDSelectorBatch(positions.astype(np.int64)), None
+
+    def _search_params(self, selector):
+        if self.config.index_type == "ivf":
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.config.ivf_nprobe)
+        if self.config.index_type == "hnsw":
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.config.hnsw_ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def search(self, user_vecs: np.ndarray, k: int, candidate_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, list]:
+        """
+        Ищет k ближайших товаров для батча векторов пользователей.
+
+        Аргументы:
+            user_vecs: Векторы пользователей (b x dim)
+            k: Количество товаров на запрос
+            candidate_ids: id товаров, которыми ограничен поиск (None — весь индекс)
+
+        Возвращает:
+            Tuple: матрица скоров (b x k) и списки id товаров для каждого запроса
+        """
+        user_vecs = np.ascontiguousarray(user_vecs, dtype=np.float32).reshape(-1, self.index.d)
+        params = None
+        if candidate_ids is not None:
+            candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+            positions = np.clip(np.searchsorted(self.ids, candidate_ids), 0, len(self.ids) - 1)
+            positions = positions[self.ids[positions] == candidate_ids]
+            # bits должен жить до конца поиска: селектор ссылается на его память
+            selector, bits = self._selector(positions)
+            params = self._search_params(selector)
+
+        scores, positions = self.index.search(user_vecs, min(k, len(self.ids)), params=params)
+        results = [self.ids[row[row >= 0]].tolist() for row in positions]
+        return scores, results
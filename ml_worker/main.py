@@ -1,14 +1,17 @@
 from rmq.rmqconf import RabbitMQConfig
 from rmq.rmqworker import MLWorker
+from database.config import get_settings
+from supervisor import WorkerSupervisor
+from indexing.faiss_index import IndexConfig
 # from rmq.rpcworker import RPCWorker
 import sys
 import pika
 import time
 import logging
+import functools
 import subprocess
 
 
-subprocess.run(["python", "startup.py"], check=True)
 # Настраиваем базовую конфигурацию логирования
 logging.basicConfig(
     level=logging.DEBUG,  # Устанавливаем уровень логирования DEBUG
@@ -44,13 +47,38 @@ def run_worker(worker):
         
         time.sleep(1)
 
+def run_shared_worker(config: RabbitMQConfig, shared_dir: str):
+    """Точка входа дочернего процесса супервизора."""
+    run_worker(MLWorker(config, shared_catalog_dir=shared_dir))
+
 def main():
+    # Запускается здесь, а не при импорте: дочерние процессы супервизора импортируют этот модуль
+    subprocess.run(["python", "startup.py"], check=True)
     mode = 'ml' # Можно использовать rpc
     logger.info(f"Starting worker in {mode} mode")
     
     worker = None
     try:
-        config = RabbitMQConfig()
+        settings = get_settings()
+        config = RabbitMQConfig(
+            batch_size=settings.WORKER_BATCH_SIZE,
+            batch_timeout_ms=settings.WORKER_BATCH_TIMEOUT_MS,
+            prefetch_count=settings.WORKER_PREFETCH_COUNT,
+            concurrency=settings.WORKER_CONCURRENCY
+        )
+        if settings.WORKER_PROCESSES > 1:
+            logger.info(f"Starting supervisor with {settings.WORKER_PROCESSES} worker processes")
+            supervisor = WorkerSupervisor(
+                processes=settings.WORKER_PROCESSES,
+                target=functools.partial(run_shared_worker, config, settings.CATALOG_SHARED_DIR),
+                shared_dir=settings.CATALOG_SHARED_DIR,
+                index_config=IndexConfig.from_settings(settings),
+                refresh_interval=settings.CATALOG_REFRESH_SECONDS,
+                with_lexical=settings.SEARCH_BACKEND == "bm25"
+            )
+            supervisor.run()
+            return 0
+
         worker = create_worker(mode, config)
         run_worker(worker)
     except Exception as e:
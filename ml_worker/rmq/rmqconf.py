@@ -13,9 +13,13 @@ class RabbitMQConfig:
         username: Имя пользователя
         password: Пароль
         queue_name: Название основной очереди задач
-        rpc_queue_name: Название очереди для RPC-запросов
+        rpc_queue_name: Название очереди результатов (reply_to задач)
         heartbeat: Интервал проверки соединения в секундах
         connection_timeout: Таймаут подключения в секундах
+        batch_size: Максимальный размер батча задач (1 — обработка по одной)
+        batch_timeout_ms: Максимальное ожидание добора батча в миллисекундах
+        prefetch_count: Максимум неподтверждённых сообщений на воркер (0 — batch_size * concurrency)
+        concurrency: Количество потоков обработки задач (1 — в потоке соединения)
     """
     # Параметры подключения
     host: str = 'rabbitmq'
@@ -34,6 +38,21 @@ class RabbitMQConfig:
     heartbeat: int = 30
     connection_timeout: int = 2
 
+    # Параметры батчевой обработки
+    batch_size: int = 1
+    batch_timeout_ms: int = 50
+
+    # Параметры параллельной обработки
+    prefetch_count: int = 0
+    concurrency: int = 1
+
+    @property
+    def effective_prefetch(self) -> int:
+        """Лимит prefetch: не меньше, чем нужно, чтобы занять все потоки полными батчами."""
+        if self.prefetch_count:
+            return max(self.prefetch_count, self.batch_size)
+        return self.batch_size * self.concurrency
+
     def get_connection_params(self) -> pika.ConnectionParameters:
         """Создает параметры подключения к RabbitMQ."""
         return pika.ConnectionParameters(
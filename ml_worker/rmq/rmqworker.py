@@ -1,6 +1,3 @@
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
 from rmq.rmqconf import RabbitMQConfig
 import pika
 import time
@@ -8,15 +5,30 @@ import requests
 import logging
 import json
 import numpy as np
-import faiss
 from sqlmodel import Session, select
 from models.item import Item
 from models.interaction import Interaction
 from models.user import User
 from models.recommendation_task import RecommendationTask
 from services.crud import user as UserService
-from database.database import get_database_engine
+from services.crud import item as ItemService
+from services.recsys.catalog import ItemCatalog, CatalogSnapshot, top_k
+from services.recsys.ranking import rank_exact
+from services.recsys.rerank import Reranker
+from services.recsys.popular import PopularItems
+from services.recsys.cache import TTLCache, normalize_query
+from services.recsys.shared import SharedCatalog
+from services.recsys.projection import get_user_projector
+from services.recsys.user_embedding import projected_embedding
+from services.recsys.embedding import decode_embedding
+from indexing.faiss_index import IndexConfig, ItemIndex
+from database.database import engine
+from database.config import get_settings
 import socket
+from typing import Optional
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 
 logger = logging.getLogger(__name__)
@@ -29,16 +41,30 @@ logging.basicConfig(
 
 logging.getLogger('pika').setLevel(logging.INFO)
 
-class ContrastiveDotModel(nn.Module):
-    def __init__(self, embedding_dim):
-        super().__init__()
-        self.user_projection = nn.Linear(embedding_dim, embedding_dim)
-        self.item_projection = nn.Linear(embedding_dim, embedding_dim)
+class ThreadSafeChannel:
+    """
+    Обёртка канала для вызовов из потоков пула.
 
-    def forward(self, user_vecs, item_vecs):
-        user_proj = F.normalize(self.user_projection(user_vecs), dim=1)
-        item_proj = F.normalize(self.item_projection(item_vecs), dim=1)
-        return user_proj, item_proj
+    Каналы pika не потокобезопасны, поэтому ack/nack и публикация
+    передаются в поток соединения через add_callback_threadsafe
+    и выполняются там в порядке вызова.
+    """
+
+    def __init__(self, connection, channel):
+        self.connection = connection
+        self.channel = channel
+
+    def _call(self, method, **kwargs) -> None:
+        self.connection.add_callback_threadsafe(functools.partial(method, **kwargs))
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self._call(self.channel.basic_ack, delivery_tag=delivery_tag, multiple=multiple)
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self._call(self.channel.basic_nack, delivery_tag=delivery_tag, multiple=multiple, requeue=requeue)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self._call(self.channel.basic_publish, exchange=exchange, routing_key=routing_key, body=body, properties=properties)
 
 # Определяем основной класс для обработки ML задач
 class MLWorker:
@@ -46,18 +72,62 @@ class MLWorker:
     RETRY_DELAY = 0.5
     RESULT_ENDPOINT = 'http://app:8080/api/recommendation/send_task_result'
 
-    def __init__(self, config: RabbitMQConfig):
+    def __init__(self, config: RabbitMQConfig, shared_catalog_dir: Optional[str] = None):
         self.config = config
         self.connection = None
         self.channel = None
         self.retry_count = 0
-
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        embedding_dim = 200
-        self.model = ContrastiveDotModel(embedding_dim)
-        self.model.load_state_dict(torch.load("ml_models/contrastive_rating_best.pth", map_location=self.device))
-        self.model.to(self.device)
-        self.model.eval()
+        self.executor = None
+        if config.concurrency > 1:
+            self.executor = ThreadPoolExecutor(max_workers=config.concurrency, thread_name_prefix="ml-task")
+
+        # Из модели воркеру нужен только слой user_projection: он применяется на NumPy
+        self.projector = get_user_projector()
+        # Версия весов: сохранённые проекции пользователей другой версии пересчитываются
+        self.model_version = self.projector.version
+
+        # Матрица проекций товаров живёт в памяти между задачами
+        settings = get_settings()
+        self.index_config = IndexConfig.from_settings(settings)
+        if shared_catalog_dir:
+            # Дочерний процесс супервизора: каталог и индекс отображаются из общих файлов
+            self.catalog = SharedCatalog(shared_catalog_dir)
+            self.index_config.mmap = True
+        else:
+            self.catalog = ItemCatalog(
+                refresh_interval=settings.CATALOG_REFRESH_SECONDS,
+                with_lexical=settings.SEARCH_BACKEND == "bm25"
+            )
+        self.popular = PopularItems(
+            top_k=settings.POPULAR_TOP_K,
+            max_queries=settings.POPULAR_QUERY_CACHE_SIZE,
+            refresh_interval=settings.POPULAR_REFRESH_SECONDS
+        )
+        # Кандидаты поискового запроса не зависят от пользователя и переиспользуются между задачами
+        self.query_cache = TTLCache(
+            max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+            ttl=settings.QUERY_CACHE_TTL_SECONDS
+        )
+        self.filter_exact_max = settings.FILTER_EXACT_MAX_CANDIDATES
+        self.search_max_candidates = settings.SEARCH_MAX_CANDIDATES
+        self.hybrid_alpha = settings.SEARCH_HYBRID_ALPHA
+        self.reranker = None
+        if settings.RERANK_ENABLED:
+            self.reranker = Reranker(
+                candidates=settings.RERANK_CANDIDATES,
+                budget_ms=settings.RERANK_BUDGET_MS,
+                popularity_weight=settings.RERANK_POPULARITY_WEIGHT,
+                lexical_weight=settings.RERANK_LEXICAL_WEIGHT
+            )
+        self.index = None
+        self._index_building = threading.Lock()
+        try:
+            with Session(engine) as session:
+                snapshot = self.catalog.refresh(session, force=True)
+            if len(snapshot):
+                self.index = ItemIndex.load_or_build(snapshot, self.index_config)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить каталог при старте: {e}")
 
     def connect(self) -> None:
         while True:
@@ -66,6 +136,9 @@ class MLWorker:
                 self.connection = pika.BlockingConnection(connection_params)
                 self.channel = self.connection.channel()
                 self.channel.queue_declare(queue=self.config.queue_name)
+                self.channel.queue_declare(queue=self.config.rpc_queue_name, durable=True)
+                # Ограничиваем prefetch, чтобы брокер распределял задачи между репликами равномерно
+                self.channel.basic_qos(prefetch_count=self.config.effective_prefetch)
                 logger.info("Successfully connected to RabbitMQ")
                 break
             except Exception as e:
@@ -82,6 +155,23 @@ class MLWorker:
         except Exception as e:
             logger.error(f"Ошибка при закрытии соединений: {e}")
 
+    def publish_result(self, ch, properties, result: str) -> bool:
+        """Публикует результат в очередь reply_to задачи с её correlation_id."""
+        try:
+            ch.basic_publish(
+                exchange='',
+                routing_key=properties.reply_to,
+                body=result,
+                properties=pika.BasicProperties(
+                    correlation_id=properties.correlation_id,
+                    delivery_mode=2
+                )
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to publish result: {e}")
+            return False
+
     def send_result(self, task_id: str, result: str) -> bool:
         try:
             response = requests.post(
@@ -94,121 +184,282 @@ class MLWorker:
             logger.error(f"Failed to send result: {e}")
             return False
 
-    def process_message(self, ch, method, properties, body):
-        try:
-            logger.info(f"Processing message: {body}")
-            data = json.loads(body.decode("utf-8"))
-
-            user_id = data.get("user_id")
-            
-            # Получаем top_n от клиента (может быть до 50), но ограничим в зависимости от задачи
-            requested_top_n = int(data.get("top_n", 10))
-            top_n = min(requested_top_n, 50) if data.get("query") else 10
-
-            task_id = data.get("task_id")
-            filter_item_ids = data.get("item_ids")
-            query_text = data.get("query")
-
-            query = select(Item).where(Item.embedding != None)
-
-            # Если есть query (поисковый запрос) — фильтруем по title/description
-            if query_text:
-                logger.info(f"Поисковый запрос от пользователя: {query_text}")
-                query = query.where(
-                    (Item.title.ilike(f"%{query_text}%")) |
-                    (Item.description.ilike(f"%{query_text}%"))
-                )
-            
-            # Если заданы item_ids напрямую (например, через старый механизм) — фильтруем по ним
-            elif filter_item_ids:
-                logger.info(f"Фильтрация item_ids: {filter_item_ids[:10]}... (всего {len(filter_item_ids)})")
-                query = query.where(Item.id.in_(filter_item_ids))
+    def ensure_index(self, snapshot: CatalogSnapshot) -> None:
+        """
+        Перестраивает FAISS-индекс в фоне, если каталог сменил версию.
 
-            if user_id is None or task_id is None:
-                raise ValueError("Missing user_id or task_id")
+        Пока новый индекс строится, запросы обслуживает предыдущий.
+        """
+        if not len(snapshot) or (self.index is not None and self.index.matches(snapshot, self.index_config)):
+            return
+        if not self._index_building.acquire(blocking=False):
+            return
 
-            engine = get_database_engine()
-            with Session(engine) as session:
-                users = session.exec(select(User)).all()
-                for u in users:
-                    logger.info("User in DB: id=%s, email=%s, created_at=%s", u.id, u.email, u.created_at)
-
-                logger.info(f"Запрашиваем user_id={user_id} из базы...")
-                user = UserService.get_user_by_id(user_id, session)
-
-                if not user:
-                    logger.error(f"Пользователь с id={user_id} не найден в базе")
-                    raise ValueError("User not found")
-                
-                logger.info(f"Пользователь найден: {user.email} (id={user.id})")
-                
-                if not user.embedding:
-                    logger.warning(f"Embedding у пользователя id={user.id} отсутствует")
-
-                    base_query = select(Item).where(Item.embedding != None)
-
-                    if query_text:
-                        logger.info(f"[Fallback+Query] Фильтруем по запросу: {query_text}")
-                        base_query = base_query.where(
-                            (Item.title.ilike(f"%{query_text}%")) |
-                            (Item.description.ilike(f"%{query_text}%"))
-                        )
-                    
-                    items = session.exec(
-                        base_query.order_by(Item.popularity_score.desc()).limit(top_n)
-                    ).all()
-                    top_items = [item.id for item in items]
-
-                    logger.info(f"[Fallback] Top popular items for user {user.id}: {top_items}")
-                    result = json.dumps(top_items)
-
-                    if self.send_result(task_id, result):
-                        ch.basic_ack(delivery_tag=method.delivery_tag)
-                        logger.info("Task completed successfully (fallback)")
-                    else:
-                        raise Exception("Failed to send fallback result")
-                    return
-                
-                user_emb = json.loads(user.embedding)
-                logger.info(f"Размерность user embedding: {len(user_emb)}")
-                
-                items = session.exec(query).all()
-
-                # сырой вектор юзера
-                user_tensor = torch.tensor(user_emb, dtype=torch.float32).unsqueeze(0).to(self.device)
-
-                with torch.no_grad():
-                    user_proj = self.model.user_projection(user_tensor)
-                    user_proj = F.normalize(user_proj, dim=1)
-                
-                # Подготовим матрицу item-векторов
-                item_ids = []
-                item_vectors = []
-
-                for item in items:
-                    try:
-                        vec = json.loads(item.embedding_proj)
-                        item_vectors.append(vec)
-                        item_ids.append(item.id)
-                    except Exception as e:
-                        logger.warning(f"Не удалось распарсить embedding товара {item.id}: {e}")
-                
-                if not item_vectors:
-                    raise ValueError("Нет валидных item-векторов для ранжирования")
-                
-                item_matrix = np.stack(item_vectors).astype("float32")
-                user_vec = user_proj.cpu().numpy().astype("float32")
-                
-                index = faiss.IndexFlatIP(item_matrix.shape[1])
-                index.add(item_matrix)
-                _, I = index.search(user_vec, top_n)
-
-                top_items = [item_ids[i] for i in I[0]]
-
-            logger.info(f"Top items for user {user_id}: {top_items}")
-            result = json.dumps(top_items)
-
-            if self.send_result(task_id, result):
+        def build():
+            try:
+                self.index = ItemIndex.load_or_build(snapshot, self.index_config)
+            except Exception as e:
+                logger.error(f"Ошибка построения FAISS-индекса: {e}")
+            finally:
+                self._index_building.release()
+
+        if self.index is None:
+            build()
+        else:
+            threading.Thread(target=build, name="index-builder", daemon=True).start()
+
+    def rank(self, snapshot: CatalogSnapshot, user_vec: np.ndarray, top_n: int, candidates=None, lexical_scores=None) -> list:
+        """
+        Ранжирует товары резидентного каталога по скалярному произведению с вектором пользователя.
+
+        Аргументы:
+            snapshot: Снимок каталога
+            user_vec: Проецированный нормализованный вектор пользователя
+            top_n: Количество товаров в ответе
+            candidates: Номера строк матрицы, которыми ограничен поиск (None — весь каталог)
+            lexical_scores: BM25-скоры кандидатов; если заданы, итоговый скор гибридный
+
+        Небольшой набор кандидатов скорится напрямую по строкам матрицы,
+        крупный — через предпостроенный FAISS-индекс с селектором id,
+        так что индекс под каждый запрос не перестраивается.
+        """
+        if candidates is not None and not len(candidates):
+            return []
+
+        if self.index is not None:
+            if candidates is None:
+                _, results = self.index.search(user_vec, top_n)
+                return results[0]
+            if len(candidates) > self.filter_exact_max and lexical_scores is None:
+                _, results = self.index.search(user_vec, top_n, candidate_ids=snapshot.ids[candidates])
+                # Графовый/кластерный поиск с фильтром может вернуть меньше k — добираем точным
+                if len(results[0]) >= min(top_n, len(candidates)):
+                    return results[0]
+
+        return rank_exact(snapshot, user_vec, top_n, candidates, lexical_scores, self.hybrid_alpha)
+
+    def rank_batch(self, snapshot: CatalogSnapshot, user_vecs: np.ndarray, top_ns: list, candidates: list, lexical_scores: list) -> list:
+        """
+        Ранжирует товары сразу для батча пользователей.
+
+        Задачи без фильтра обслуживаются одним батчевым поиском
+        (одно матричное умножение), отфильтрованные — по одной через rank.
+        Если включена переоценка, поиск отбирает reranker.candidates товаров,
+        а итоговые top_n выбирает Reranker.
+        """
+        if self.reranker is None:
+            return self.retrieve_batch(snapshot, user_vecs, top_ns, candidates, lexical_scores)
+
+        started = time.perf_counter()
+        retrieved = self.retrieve_batch(
+            snapshot, user_vecs, [max(n, self.reranker.candidates) for n in top_ns], candidates, lexical_scores
+        )
+        retrieved_at = time.perf_counter()
+
+        results = []
+        skipped = 0
+        for i, ids in enumerate(retrieved):
+            if (time.perf_counter() - started) * 1000 > self.reranker.budget_ms:
+                # Бюджет исчерпан: остаток батча получает порядок первого этапа
+                results.append(ids[:top_ns[i]])
+                skipped += 1
+                continue
+            results.append(self.reranker.rerank(snapshot, user_vecs[i], ids, top_ns[i], candidates[i], lexical_scores[i]))
+
+        logger.info(
+            "Ранжирование батча из %d задач: поиск %.1f мс, переоценка %.1f мс, без переоценки %d",
+            len(top_ns), (retrieved_at - started) * 1000, (time.perf_counter() - retrieved_at) * 1000, skipped
+        )
+        return results
+
+    def retrieve_batch(self, snapshot: CatalogSnapshot, user_vecs: np.ndarray, top_ns: list, candidates: list, lexical_scores: list) -> list:
+        """Отбирает top_ns[i] товаров для каждой задачи батча по вектору пользователя."""
+        results = [None] * len(top_ns)
+
+        unfiltered = [i for i, c in enumerate(candidates) if c is None]
+        if unfiltered:
+            k = max(top_ns[i] for i in unfiltered)
+            if self.index is not None:
+                _, found = self.index.search(user_vecs[unfiltered], k)
+            elif len(snapshot):
+                scores = user_vecs[unfiltered] @ snapshot.matrix.T
+                found = snapshot.ids[top_k(scores, k)].tolist()
+            else:
+                raise ValueError("Нет валидных item-векторов для ранжирования")
+            for i, ids in zip(unfiltered, found):
+                results[i] = ids[:top_ns[i]]
+
+        for i, c in enumerate(candidates):
+            if c is not None:
+                results[i] = self.rank(snapshot, user_vecs[i], top_ns[i], c, lexical_scores[i])
+        return results
+
+    def project_users(self, embeddings: list) -> np.ndarray:
+        """Проецирует и нормализует сырые векторы пользователей одним матричным умножением."""
+        return self.projector.project(np.stack(embeddings))
+
+    def popular_items(self, task: dict, snapshot: CatalogSnapshot, session: Session) -> list:
+        """
+        Fallback для пользователей без эмбеддинга: самые популярные товары.
+
+        Поисковый запрос при наличии BM25-индекса обслуживается из памяти
+        по убыванию текстовой релевантности, остальные — из кэша
+        популярных товаров (PopularItems), без запроса к БД на каждую задачу.
+        """
+        query_text = task["query"]
+        if query_text and snapshot.lexical is not None:
+            positions, _ = snapshot.lexical.search(query_text, limit=task["top_n"])
+            top_items = snapshot.ids[positions].tolist()
+            logger.info(f"[Fallback+BM25] Top items for user {task['user_id']}: {top_items}")
+            return top_items
+
+        top_items = self.popular.get(session, task["top_n"], query_text)
+        logger.info(f"[Fallback] Top popular items for user {task['user_id']}: {top_items}")
+        return top_items
+
+    def query_candidates(self, query_text: str, snapshot: CatalogSnapshot, session: Session) -> tuple:
+        """
+        Кандидаты поискового запроса: номера строк матрицы и BM25-скоры (или None).
+
+        Результат кэшируется по версии каталога и нормализованному тексту запроса,
+        так что одинаковые запросы разных пользователей ищутся один раз,
+        а дальше стоят только скалярного произведения по кандидатам.
+        """
+        key = (snapshot.version, normalize_query(query_text))
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Кандидаты — строки резидентной матрицы; из БД читаем только id
+        if snapshot.lexical is not None:
+            positions, scores = snapshot.lexical.search(query_text, limit=self.search_max_candidates)
+        else:
+            candidate_ids = ItemService.search_item_ids(query_text, session, limit=self.search_max_candidates)
+            positions, scores = snapshot.positions(candidate_ids), None
+
+        # Массивы общие для задач разных пользователей — защищаем их от изменения
+        for array in (positions, scores):
+            if isinstance(array, np.ndarray):
+                array.setflags(write=False)
+        self.query_cache.set(key, (positions, scores))
+        return positions, scores
+
+    def candidates(self, task: dict, snapshot: CatalogSnapshot, session: Session) -> tuple:
+        """
+        Кандидаты задачи: номера строк матрицы (None — без ограничения)
+        и их BM25-скоры для гибридного ранжирования (None — только векторный скор).
+        """
+        query_text = task["query"]
+        filter_item_ids = task["item_ids"]
+
+        if query_text:
+            logger.info(f"Поисковый запрос от пользователя: {query_text}")
+            return self.query_candidates(query_text, snapshot, session)
+
+        if filter_item_ids:
+            # id сопоставляются со строками матрицы в памяти, без IN-запроса в БД
+            logger.info(f"Фильтрация item_ids: {filter_item_ids[:10]}... (всего {len(filter_item_ids)})")
+            return snapshot.positions(filter_item_ids), None
+
+        return None, None
+
+    def parse_task(self, body: bytes) -> dict:
+        """Разбирает сообщение очереди в параметры задачи."""
+        data = json.loads(body.decode("utf-8"))
+
+        user_id = data.get("user_id")
+        task_id = data.get("task_id")
+        if user_id is None or task_id is None:
+            raise ValueError("Missing user_id or task_id")
+
+        # Получаем top_n от клиента (может быть до 50), но ограничим в зависимости от задачи
+        query_text = data.get("query")
+        requested_top_n = int(data.get("top_n", 10))
+        top_n = min(requested_top_n, 50) if query_text else 10
+
+        return {
+            "task_id": task_id,
+            "user_id": user_id,
+            "top_n": top_n,
+            "query": query_text,
+            "item_ids": data.get("item_ids"),
+        }
+
+    def recommend(self, tasks: list) -> list:
+        """
+        Считает рекомендации для батча задач в одной сессии БД.
+
+        Возвращает:
+            list: Для каждой задачи список id товаров либо исключение
+        """
+        results = [None] * len(tasks)
+        personal = []
+
+        with Session(engine) as session:
+            snapshot = self.catalog.refresh(session)
+            self.ensure_index(snapshot)
+
+            user_ids = list({task["user_id"] for task in tasks})
+            users = {user.id: user for user in UserService.get_users_by_ids(user_ids, session)}
+
+            for i, task in enumerate(tasks):
+                try:
+                    user = users.get(task["user_id"])
+                    if not user:
+                        logger.error(f"Пользователь с id={task['user_id']} не найден в базе")
+                        raise ValueError("User not found")
+
+                    if not user.embedding:
+                        logger.warning(f"Embedding у пользователя id={user.id} отсутствует")
+                        results[i] = self.popular_items(task, snapshot, session)
+                        continue
+
+                    candidates, lexical_scores = self.candidates(task, snapshot, session)
+                    personal.append((i, user, candidates, lexical_scores))
+                except Exception as e:
+                    results[i] = e
+
+            # Проекция, сохранённая при обновлении эмбеддинга, используется как есть;
+            # через модель проходят только пользователи без неё или с другой версией модели
+            user_vecs = [projected_embedding(user, self.model_version) for _, user, _, _ in personal]
+            stale = [j for j, vec in enumerate(user_vecs) if vec is None]
+            if stale:
+                projected = self.project_users([decode_embedding(personal[j][1].embedding) for j in stale])
+                for j, vec in zip(stale, projected):
+                    user_vecs[j] = vec
+
+        if personal:
+            user_vecs = np.stack(user_vecs).astype("float32")
+            ranked = self.rank_batch(
+                snapshot,
+                user_vecs,
+                [tasks[i]["top_n"] for i, _, _, _ in personal],
+                [candidates for _, _, candidates, _ in personal],
+                [lexical_scores for _, _, _, lexical_scores in personal]
+            )
+            for (i, _, _, _), top_items in zip(personal, ranked):
+                results[i] = top_items
+
+        return results
+
+    def complete(self, ch, method, properties, task: dict, result) -> None:
+        """
+        Отправляет результат задачи и подтверждает (или отклоняет) её сообщение.
+
+        Результат публикуется в очередь reply_to; задачи без reply_to
+        (поставленные старым клиентом) получают результат HTTP-запросом.
+        """
+        try:
+            if isinstance(result, Exception):
+                raise result
+
+            logger.info(f"Top items for user {task['user_id']}: {result}")
+            payload = json.dumps(result)
+            if properties is not None and properties.reply_to:
+                sent = self.publish_result(ch, properties, payload)
+            else:
+                sent = self.send_result(task["task_id"], payload)
+            if sent:
                 ch.basic_ack(delivery_tag=method.delivery_tag)
                 logger.info("Task completed successfully")
             else:
@@ -218,8 +469,98 @@ class MLWorker:
             logger.error(f"Error processing task: {e}")
             ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
+    def process_batch(self, ch, messages: list) -> None:
+        """
+        Обрабатывает пачку сообщений: общий скоринг, затем ack/nack каждого по отдельности.
+
+        Аргументы:
+            ch: Канал RabbitMQ
+            messages: Список кортежей (method, properties, body)
+        """
+        tasks = []
+        for method, properties, body in messages:
+            try:
+                logger.info(f"Processing message: {body}")
+                tasks.append((method, properties, self.parse_task(body)))
+            except Exception as e:
+                logger.error(f"Error processing task: {e}")
+                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+        if not tasks:
+            return
+
+        try:
+            results = self.recommend([task for _, _, task in tasks])
+        except Exception as e:
+            logger.error(f"Error processing batch: {e}")
+            results = [e] * len(tasks)
+
+        for (method, properties, task), result in zip(tasks, results):
+            self.complete(ch, method, properties, task, result)
+
+    def process_batch_safe(self, ch, messages: list) -> None:
+        try:
+            self.process_batch(ch, messages)
+        except Exception as e:
+            logger.error(f"Unexpected error in task thread: {e}")
+
+    def dispatch(self, ch, messages: list) -> None:
+        """
+        Передаёт пачку сообщений на обработку.
+
+        В параллельном режиме пачка уходит в пул потоков, а поток соединения
+        сразу возвращается к приёму сообщений; ack/nack из пула
+        выполняются в потоке соединения через ThreadSafeChannel.
+        """
+        if self.executor is None:
+            self.process_batch(ch, messages)
+            return
+        channel = ThreadSafeChannel(self.connection, ch)
+        self.executor.submit(self.process_batch_safe, channel, messages)
+
+    def process_message(self, ch, method, properties, body):
+        self.dispatch(ch, [(method, properties, body)])
+
+    def consume_batches(self) -> None:
+        """
+        Собирает сообщения в батчи: до batch_size штук или до batch_timeout_ms
+        с момента прихода первого сообщения, в зависимости от того, что наступит раньше.
+        """
+        batch_size = self.config.batch_size
+        batch_timeout = self.config.batch_timeout_ms / 1000
+        pending = []
+
+        def on_message(ch, method, properties, body):
+            pending.append((method, properties, body))
+
+        self.channel.basic_consume(
+            queue=self.config.queue_name,
+            on_message_callback=on_message,
+            auto_ack=False
+        )
+        logger.info(f'Started consuming messages in batches of {batch_size}. Press Ctrl+C to exit.')
+
+        while True:
+            if not pending:
+                self.connection.process_data_events(time_limit=1)
+                continue
+
+            deadline = time.monotonic() + batch_timeout
+            while len(pending) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.connection.process_data_events(time_limit=remaining)
+
+            batch, pending[:] = pending[:batch_size], pending[batch_size:]
+            self.dispatch(self.channel, batch)
+
     def start_consuming(self) -> None:
         try:
+            if self.config.batch_size > 1:
+                self.consume_batches()
+                return
+
             self.channel.basic_consume(
                 queue=self.config.queue_name,
                 on_message_callback=self.process_message,
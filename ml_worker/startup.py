@@ -1,6 +1,7 @@
 import os
 import gdown
 import logging
+import importlib.util
 
 
 # Настройка логирования как в main.py
@@ -32,3 +33,21 @@ if not os.path.exists(model_path):
         logger.error(f"[startup] Ошибка при скачивании модели: {str(e)}")
 else:
     logger.info(f"[startup] Модель {model_path} уже существует. Пропускаем загрузку.")
+
+# Экспорт весов для инференса без torch (torch нужен только на этом шаге)
+weights_path = os.getenv("MODEL_WEIGHTS_PATH", "ml_models/user_projection.npz")
+if not os.path.exists(weights_path) and os.path.exists(model_path):
+    if importlib.util.find_spec("torch") is None:
+        logger.error(
+            f"[startup] Экспорт весов в {weights_path} пропущен: torch не установлен. "
+            "Соберите образ с --build-arg WITH_EXPORT=true или запустите export_model.py "
+            "в окружении из requirements-export.txt"
+        )
+    else:
+        logger.info(f"[startup] Экспорт весов модели в {weights_path}...")
+        try:
+            from services.recsys.projection import UserProjector
+            UserProjector.from_checkpoint(model_path).save(weights_path)
+            logger.info(f"[startup] Веса модели сохранены в {weights_path}.")
+        except Exception as e:
+            logger.error(f"[startup] Ошибка экспорта весов модели: {str(e)}")
@@ -0,0 +1,128 @@
+import os
+import time
+import signal
+import logging
+import multiprocessing
+from dataclasses import replace
+from typing import Callable
+
+from sqlmodel import Session
+
+from services.recsys.catalog import ItemCatalog
+from services.recsys.shared import publish_snapshot, load_published
+from indexing.faiss_index import IndexConfig, ItemIndex
+from database.database import engine
+
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerSupervisor:
+    """
+    Супервизор нескольких процессов-консьюмеров на одном узле.
+
+    Супервизор единственный читает каталог из БД: строит FAISS-индекс,
+    публикует матрицу проекций в shared_dir и запускает дочерние процессы,
+    которые отображают матрицу и индекс в память без копирования.
+    При смене версии каталога снимок публикуется заново,
+    упавшие дочерние процессы перезапускаются.
+
+    Дочерние процессы запускаются через spawn, а не fork: супервизор
+    сам строит индекс, и унаследованное состояние потоков FAISS/OpenMP
+    (libgomp) может заблокировать первый поиск в дочернем процессе.
+    Поэтому target должен сериализоваться pickle (функция модуля или partial).
+
+    Attributes:
+        processes: Количество дочерних процессов
+        target: Функция, которую выполняет дочерний процесс (сериализуемая pickle)
+        shared_dir: Каталог для публикации снимков
+        index_config: Параметры FAISS-индекса
+        refresh_interval: Период проверки версии каталога в секундах
+        start_method: Способ запуска дочерних процессов: spawn или forkserver
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        target: Callable[[], None],
+        shared_dir: str,
+        index_config: IndexConfig,
+        refresh_interval: float = 60.0,
+        with_lexical: bool = False,
+        start_method: str = "spawn"
+    ):
+        self.processes = processes
+        self.target = target
+        self.shared_dir = shared_dir
+        self.index_config = index_config
+        self.refresh_interval = refresh_interval
+        self.catalog = ItemCatalog(refresh_interval=refresh_interval, with_lexical=with_lexical)
+        self.children = {}
+        self._published = None
+        self._stopping = False
+        self._context = multiprocessing.get_context(start_method)
+
+    def publish(self) -> None:
+        """Публикует каталог и индекс, если версия каталога изменилась."""
+        with Session(engine) as session:
+            snapshot = self.catalog.refresh(session)
+        if snapshot.version == self._published and self._published is not None:
+            return
+
+        # Индекс сохраняется до переключения снимка: дочерние процессы найдут его готовым
+        if len(snapshot):
+            ItemIndex.load_or_build(snapshot, self.index_config)
+        publish_snapshot(snapshot, self.shared_dir)
+        self._published = snapshot.version
+
+        # Сам супервизор тоже переходит на отображённую копию, освобождая загруженную
+        published = load_published(self.shared_dir)
+        if published is not None:
+            self.catalog.snapshot = replace(published[1], version=snapshot.version)
+
+    def spawn(self, slot: int) -> None:
+        process = self._context.Process(target=_run_child, args=(self.target,), name=f"ml-worker-{slot}")
+        process.start()
+        self.children[slot] = process
+        logger.info(f"Запущен процесс {process.name} (pid={process.pid})")
+
+    def stop(self, signum=None, frame=None) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.publish()
+        for slot in range(self.processes):
+            self.spawn(slot)
+
+        next_refresh = time.monotonic() + self.refresh_interval
+        while not self._stopping:
+            time.sleep(1)
+            for slot, process in list(self.children.items()):
+                if not process.is_alive() and not self._stopping:
+                    logger.warning(f"Процесс {process.name} завершился с кодом {process.exitcode}, перезапуск")
+                    self.spawn(slot)
+
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + self.refresh_interval
+                try:
+                    self.publish()
+                except Exception as e:
+                    logger.error(f"Не удалось опубликовать каталог: {e}")
+
+        logger.info("Остановка дочерних процессов...")
+        for process in self.children.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        for process in self.children.values():
+            process.join(timeout=10)
+
+
+def _run_child(target: Callable[[], None]) -> None:
+    """Точка входа дочернего процесса супервизора."""
+    # Обработчики сигналов супервизора дочернему процессу не нужны
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    target()
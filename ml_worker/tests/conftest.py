@@ -0,0 +1,61 @@
+import os
+import sys
+
+# Вне контейнера модели и сервисы берутся из app (в контейнере они смонтированы в /app)
+WORKER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(os.path.dirname(WORKER_DIR), "app")
+for path in (WORKER_DIR, APP_DIR):
+    if os.path.isdir(path) and path not in sys.path:
+        sys.path.append(path)
+
+# Движок БД создаётся при импорте; в тестах он подменяется SQLite
+for name, value in {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_USER": "test", "DB_PASS": "test", "DB_NAME": "test"}.items():
+    os.environ.setdefault(name, value)
+
+import numpy as np
+import pytest
+from sqlmodel import SQLModel, Session, create_engine
+
+from database.config import get_settings
+from models.item import Item
+from models.user import User
+from services.recsys import projection
+from services.recsys.embedding import EMBEDDING_DIM, encode_embedding
+from services.recsys.projection import UserProjector
+from rmq import rmqworker
+from rmq.rmqconf import RabbitMQConfig
+
+
+@pytest.fixture(name="engine")
+def engine_fixture(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'worker.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    SQLModel.metadata.create_all(engine)
+
+    rng = np.random.default_rng(0)
+    with Session(engine) as session:
+        for i in range(300):
+            vec = rng.normal(size=EMBEDDING_DIM)
+            session.add(Item(
+                title=f"apple {i}" if i % 10 == 0 else f"banana {i}",
+                description="fruit",
+                embedding=encode_embedding(vec),
+                embedding_proj=encode_embedding(vec / np.linalg.norm(vec)),
+                popularity_score=i
+            ))
+        # Первый пользователь с эмбеддингом, второй — без (холодный старт)
+        session.add(User(email="warm@test.com", password="test", embedding=encode_embedding(rng.normal(size=EMBEDDING_DIM))))
+        session.add(User(email="cold@test.com", password="test"))
+        session.commit()
+    return engine
+
+
+@pytest.fixture(name="worker")
+def worker_fixture(engine, tmp_path, monkeypatch):
+    """Воркер на SQLite-каталоге с единичной проекцией пользователей."""
+    monkeypatch.setattr(get_settings(), "INDEX_PATH", str(tmp_path / "items.faiss"))
+    monkeypatch.setattr(rmqworker, "engine", engine)
+    monkeypatch.setattr(projection, "_projector", UserProjector(np.eye(EMBEDDING_DIM), np.zeros(EMBEDDING_DIM)))
+    return rmqworker.MLWorker(RabbitMQConfig())
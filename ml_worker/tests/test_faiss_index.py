@@ -0,0 +1,126 @@
+import logging
+
+import faiss
+import numpy as np
+import pytest
+
+from indexing import faiss_index
+from indexing.faiss_index import IndexConfig, ItemIndex
+from services.recsys.catalog import CatalogSnapshot
+
+
+DIM = 16
+
+
+def make_snapshot(n: int = 500, seed: int = 0, version=None) -> CatalogSnapshot:
+    matrix = np.random.default_rng(seed).normal(size=(n, DIM)).astype("float32")
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    # id товаров не совпадают с номерами строк
+    ids = np.arange(10, 10 + 3 * n, 3, dtype=np.int64)
+    return CatalogSnapshot(ids=ids, matrix=matrix, version=version or (n, int(ids[-1]), seed))
+
+
+def exact(snapshot: CatalogSnapshot, user_vecs: np.ndarray, k: int, positions=None) -> list:
+    positions = np.arange(len(snapshot)) if positions is None else np.asarray(positions)
+    scores = user_vecs @ snapshot.matrix[positions].T
+    return [snapshot.ids[positions[np.argsort(-row, kind="stable")[:k]]].tolist() for row in scores]
+
+
+@pytest.fixture(name="queries")
+def queries_fixture():
+    return np.random.default_rng(1).normal(size=(4, DIM)).astype("float32")
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_search_matches_exact_ranking(index_type, queries, tmp_path):
+    snapshot = make_snapshot()
+    # nprobe = nlist делает IVF точным; HNSW проверяется по полноте
+    config = IndexConfig(index_type=index_type, path=str(tmp_path / "items.faiss"), ivf_nlist=8, ivf_nprobe=8)
+    index = ItemIndex.build(snapshot, config)
+
+    _, found = index.search(queries, 10)
+    expected = exact(snapshot, queries, 10)
+    if index_type == "hnsw":
+        recall = np.mean([len(set(f) & set(e)) / 10 for f, e in zip(found, expected)])
+        assert recall >= 0.9
+    else:
+        assert found == expected
+
+
+def test_search_params_come_from_config(tmp_path):
+    snapshot = make_snapshot()
+    ivf = ItemIndex.build(snapshot, IndexConfig(index_type="ivf", ivf_nlist=8, ivf_nprobe=3))
+    assert faiss.extract_index_ivf(ivf.index).nprobe == 3
+    hnsw = ItemIndex.build(snapshot, IndexConfig(index_type="hnsw", hnsw_ef_search=17))
+    assert hnsw.index.hnsw.efSearch == 17
+
+
+@pytest.mark.parametrize("count", [3, 100])
+def test_candidate_search_stays_within_candidates(count, queries):
+    # 3 кандидата из 500 — хеш-набор id, 100 — битовая маска
+    snapshot = make_snapshot()
+    index = ItemIndex.build(snapshot, IndexConfig())
+    positions = np.sort(np.random.default_rng(2).choice(len(snapshot), count, replace=False))
+    candidate_ids = np.append(snapshot.ids[positions], 999999)  # неизвестный id пропускается
+
+    _, found = index.search(queries, 10, candidate_ids=candidate_ids)
+    assert found == exact(snapshot, queries, 10, positions)
+
+
+def test_search_drops_padding_when_k_exceeds_candidates(queries):
+    snapshot = make_snapshot()
+    index = ItemIndex.build(snapshot, IndexConfig())
+    candidate_ids = snapshot.ids[[5, 50, 400]]
+
+    _, found = index.search(queries, 10, candidate_ids=candidate_ids)
+    # FAISS дополняет ответ метками -1; они не превращаются в id последнего товара
+    assert all(sorted(row) == sorted(candidate_ids.tolist()) for row in found)
+
+    small = make_snapshot(n=4)
+    _, found = ItemIndex.build(small, IndexConfig()).search(queries, 10)
+    assert all(len(row) == 4 for row in found)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_save_and_load_roundtrip(index_type, queries, tmp_path):
+    snapshot = make_snapshot()
+    config = IndexConfig(index_type=index_type, path=str(tmp_path / "items.faiss"), ivf_nlist=8)
+    built = ItemIndex.build(snapshot, config)
+    built.save()
+
+    for mmap in (False, True):
+        config.mmap = mmap
+        loaded = ItemIndex.load(config)
+        assert loaded.matches(snapshot, config)
+        assert loaded.search(queries, 10)[1] == built.search(queries, 10)[1]
+
+    # Индекс другого типа с диска не берётся
+    assert ItemIndex.load(IndexConfig(index_type="flat" if index_type != "flat" else "hnsw", path=config.path)) is None
+
+
+def test_load_or_build_rebuilds_on_version_mismatch(tmp_path, monkeypatch):
+    config = IndexConfig(path=str(tmp_path / "items.faiss"))
+    first = make_snapshot(seed=0)
+    ItemIndex.load_or_build(first, config)
+
+    # Та же версия — индекс берётся с диска без построения
+    with monkeypatch.context() as patch:
+        patch.setattr(ItemIndex, "build", classmethod(lambda cls, snapshot, config: pytest.fail("rebuilt")))
+        assert ItemIndex.load_or_build(first, config).matches(first, config)
+
+    second = make_snapshot(seed=5)
+    rebuilt = ItemIndex.load_or_build(second, config)
+    assert rebuilt.matches(second, config)
+    assert ItemIndex.load(config).matches(second, config)
+    assert np.array_equal(rebuilt.index.reconstruct(0), second.matrix[0])
+
+
+def test_mmap_without_flag_support_is_reported(tmp_path, monkeypatch, caplog):
+    snapshot = make_snapshot()
+    config = IndexConfig(path=str(tmp_path / "items.faiss"), mmap=True)
+    ItemIndex.build(snapshot, config).save()
+    monkeypatch.delattr(faiss, "IO_FLAG_MMAP_IFC", raising=False)
+
+    with caplog.at_level(logging.WARNING, logger=faiss_index.__name__):
+        assert ItemIndex.load(config) is not None
+    assert "IO_FLAG_MMAP_IFC" in caplog.text
@@ -0,0 +1,155 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlmodel import Session
+
+from models.item import Item
+from services.recsys.embedding import EMBEDDING_DIM, encode_embedding
+from services.recsys.ranking import rank_exact
+from rmq.rmqconf import RabbitMQConfig
+from rmq.rmqworker import ThreadSafeChannel
+
+
+class FakeConnection:
+    """Соединение, которое выполняет колбэки add_callback_threadsafe только в process_data_events."""
+
+    def __init__(self):
+        self.callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback_threadsafe(self, callback):
+        with self._lock:
+            self.callbacks.append(callback)
+
+    def process_data_events(self, time_limit=None):
+        with self._lock:
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class FakeChannel:
+    """Канал, запоминающий вызовы и поток, в котором они выполнены."""
+
+    def __init__(self):
+        self.calls = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.calls.append(("ack", delivery_tag, threading.get_ident()))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.calls.append(("nack", delivery_tag, threading.get_ident()))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.calls.append(("publish", properties.correlation_id, threading.get_ident()))
+
+
+def test_thread_safe_channel_defers_calls_to_connection_thread():
+    connection, channel = FakeConnection(), FakeChannel()
+    safe = ThreadSafeChannel(connection, channel)
+
+    def from_pool():
+        safe.basic_publish(exchange="", routing_key="rpc_queue", body="[1]", properties=SimpleNamespace(correlation_id="7"))
+        safe.basic_ack(delivery_tag=1)
+        safe.basic_nack(delivery_tag=2, requeue=False)
+
+    thread = threading.Thread(target=from_pool)
+    thread.start()
+    thread.join()
+    # Из потока пула канал не трогается
+    assert channel.calls == []
+
+    connection.process_data_events(time_limit=0)
+    assert [call[:2] for call in channel.calls] == [("publish", "7"), ("ack", 1), ("nack", 2)]
+    assert {call[2] for call in channel.calls} == {threading.get_ident()}
+
+
+def test_dispatch_processes_batch_in_pool_and_settles_on_connection_thread(worker):
+    worker.executor = ThreadPoolExecutor(max_workers=2)
+    worker.connection = FakeConnection()
+    channel = FakeChannel()
+    messages = [
+        (SimpleNamespace(delivery_tag=1), SimpleNamespace(reply_to="rpc_queue", correlation_id="1"),
+         json.dumps({"task_id": 1, "user_id": 1}).encode()),
+        (SimpleNamespace(delivery_tag=2), SimpleNamespace(reply_to="rpc_queue", correlation_id="2"), b"garbage"),
+    ]
+
+    worker.dispatch(channel, messages)
+    worker.executor.shutdown(wait=True)
+    assert channel.calls == []
+
+    worker.connection.process_data_events(time_limit=0)
+    assert [call[:2] for call in channel.calls] == [("nack", 2), ("publish", "1"), ("ack", 1)]
+    assert {call[2] for call in channel.calls} == {threading.get_ident()}
+
+
+@pytest.mark.parametrize("batch_size, concurrency, prefetch_count, expected", [
+    (1, 1, 0, 1),
+    (8, 4, 0, 32),
+    (16, 4, 10, 16),
+    (8, 4, 50, 50),
+])
+def test_effective_prefetch(batch_size, concurrency, prefetch_count, expected):
+    config = RabbitMQConfig(batch_size=batch_size, concurrency=concurrency, prefetch_count=prefetch_count)
+    assert config.effective_prefetch == expected
+
+
+def test_batched_ranking_matches_one_by_one(worker):
+    messages = [
+        {"task_id": 1, "user_id": 1},
+        {"task_id": 2, "user_id": 1, "query": "apple", "top_n": 20},
+        {"task_id": 3, "user_id": 2},
+        {"task_id": 4, "user_id": 1, "item_ids": [5, 17, 42, 99, 250, 1000]},
+        {"task_id": 5, "user_id": 2, "query": "apple", "top_n": 3},
+        {"task_id": 6, "user_id": 1, "query": "banana", "top_n": 50},
+    ]
+    tasks = [worker.parse_task(json.dumps(message).encode()) for message in messages]
+
+    batched = worker.recommend(tasks)
+    single = [worker.recommend([task])[0] for task in tasks]
+    assert batched == single
+    assert [len(items) for items in batched] == [10, 20, 10, 5, 3, 50]
+
+
+def test_query_cache_is_not_reused_after_catalog_swap(worker, engine):
+    with Session(engine) as session:
+        old = worker.catalog.refresh(session, force=True)
+        positions, _ = worker.query_candidates("apple", old, session)
+        # Тот же запрос с точностью до регистра и пробелов берётся из кэша
+        assert worker.query_candidates("  APPLE ", old, session)[0] is positions
+
+        vec = np.ones(EMBEDDING_DIM, dtype="float32")
+        item = Item(title="apple new", embedding=encode_embedding(vec), embedding_proj=encode_embedding(vec / np.linalg.norm(vec)))
+        session.add(item)
+        session.commit()
+        new = worker.catalog.refresh(session, force=True)
+        assert new.version != old.version
+
+        new_positions, _ = worker.query_candidates("apple", new, session)
+        assert new_positions is not positions
+        assert item.id in new.ids[new_positions].tolist()
+        assert item.id not in old.ids[positions].tolist()
+
+
+def test_filtered_ann_search_matches_exact_ranking(worker, engine):
+    with Session(engine) as session:
+        snapshot = worker.catalog.refresh(session)
+    worker.ensure_index(snapshot)
+    worker.filter_exact_max = 10
+    candidates = np.arange(0, len(snapshot), 3)
+    user_vec = np.random.default_rng(7).normal(size=EMBEDDING_DIM).astype("float32")
+    user_vec /= np.linalg.norm(user_vec)
+
+    searched = []
+    search = worker.index.search
+    worker.index.search = lambda *args, **kwargs: searched.append(kwargs.get("candidate_ids")) or search(*args, **kwargs)
+
+    top_items = worker.rank(snapshot, user_vec, 20, candidates)
+    # Крупный набор кандидатов ищется через FAISS с селектором id, а не точным скорингом
+    assert searched and searched[0] is not None
+    assert set(top_items) <= set(snapshot.ids[candidates].tolist())
+    assert top_items == rank_exact(snapshot, user_vec, 20, candidates)
@@ -0,0 +1,98 @@
+import os
+import signal
+import functools
+import threading
+
+import numpy as np
+from sqlmodel import Session
+
+import supervisor
+from indexing.faiss_index import IndexConfig, ItemIndex
+from models.item import Item
+from services.recsys.embedding import EMBEDDING_DIM, encode_embedding
+from services.recsys.shared import load_published
+
+
+def record_start(root: str, exitcode: int = 0) -> None:
+    """Дочерний процесс: отмечает запуск файлом со своим pid и завершается."""
+    with open(os.path.join(root, f"{os.getpid()}.started"), "w"):
+        pass
+    raise SystemExit(exitcode)
+
+
+def make_supervisor(engine, tmp_path, monkeypatch, target=None) -> supervisor.WorkerSupervisor:
+    monkeypatch.setattr(supervisor, "engine", engine)
+    return supervisor.WorkerSupervisor(
+        processes=2,
+        target=target or functools.partial(record_start, str(tmp_path)),
+        shared_dir=str(tmp_path / "shared"),
+        index_config=IndexConfig(path=str(tmp_path / "items.faiss")),
+        refresh_interval=0
+    )
+
+
+def test_publish_switches_snapshot_and_index_on_new_version(engine, tmp_path, monkeypatch):
+    sup = make_supervisor(engine, tmp_path, monkeypatch)
+    published = []
+    publish_snapshot = supervisor.publish_snapshot
+    monkeypatch.setattr(supervisor, "publish_snapshot", lambda snapshot, root: published.append(snapshot.version) or publish_snapshot(snapshot, root))
+
+    sup.publish()
+    first = load_published(sup.shared_dir)[1]
+    assert len(first) == 300
+    # Индекс сохранён до переключения снимка и соответствует его версии
+    assert ItemIndex.load(sup.index_config).matches(first, sup.index_config)
+    # Супервизор сам перешёл на отображённую копию
+    assert isinstance(sup.catalog.snapshot.matrix, np.memmap)
+
+    # Каталог не изменился — повторной публикации нет
+    sup.publish()
+    assert len(published) == 1
+
+    with Session(engine) as session:
+        vec = np.ones(EMBEDDING_DIM, dtype="float32")
+        session.add(Item(title="new", embedding=encode_embedding(vec), embedding_proj=encode_embedding(vec / np.linalg.norm(vec))))
+        session.commit()
+    sup.publish()
+    second = load_published(sup.shared_dir)[1]
+    assert len(published) == 2 and published[0] != published[1]
+    assert len(second) == 301
+    assert ItemIndex.load(sup.index_config).matches(second, sup.index_config)
+
+
+def test_children_are_spawned_not_forked(engine, tmp_path, monkeypatch):
+    sup = make_supervisor(engine, tmp_path, monkeypatch, target=functools.partial(record_start, str(tmp_path), 3))
+    assert sup._context.get_start_method() == "spawn"
+
+    sup.spawn(0)
+    sup.children[0].join(timeout=60)
+    assert sup.children[0].exitcode == 3
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".started")]) == 1
+
+
+def test_run_respawns_exited_children_until_stopped(engine, tmp_path, monkeypatch):
+    sup = make_supervisor(engine, tmp_path, monkeypatch)
+    spawned = []
+    spawn = sup.spawn
+    monkeypatch.setattr(sup, "spawn", lambda slot: spawned.append(slot) or spawn(slot))
+
+    def stop_after_respawns():
+        # Останавливаем супервизор, когда каждый слот перезапущен хотя бы раз
+        for _ in range(600):
+            if all(spawned.count(slot) >= 2 for slot in range(sup.processes)):
+                break
+            threading.Event().wait(0.1)
+        sup.stop()
+
+    handlers = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+    stopper = threading.Thread(target=stop_after_respawns)
+    stopper.start()
+    try:
+        sup.run()
+    finally:
+        stopper.join()
+        signal.signal(signal.SIGTERM, handlers[0])
+        signal.signal(signal.SIGINT, handlers[1])
+
+    assert all(spawned.count(slot) >= 2 for slot in range(sup.processes))
+    assert all(not process.is_alive() for process in sup.children.values())
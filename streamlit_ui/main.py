@@ -174,19 +174,36 @@ def load_top_items(query=None):
             st.warning(f"Не удалось создать задачу: {resp.status_code}")
             return
 
-        task_id = resp.json()["id"]
+        # Закэшированные рекомендации API возвращает сразу в ответе на создание задачи
+        status = resp.json()
+        task_id = status["id"]
         max_wait_time = 30
         start_time = time.time()
 
         with st.spinner("Ожидание ответа от ML воркера..."):
             while True:
-                status_resp = requests.get(f"{API_BASE}/api/recommendation/{task_id}", headers=headers)
-                try:
-                    status = status_resp.json()
-                    logger.info(f"Статус задачи: {status}")
-                except Exception as e:
-                    logger.warning("Ошибка при разборе JSON", exc_info=True)
-                    status = {}
+                if not status.get("result"):
+                    # Long-poll: API отвечает сразу по завершении задачи
+                    status_resp = requests.get(
+                        f"{API_BASE}/api/recommendation/{task_id}/wait",
+                        params={"timeout": max(1, min(25, max_wait_time - (time.time() - start_time)))},
+                        headers=headers,
+                        timeout=max_wait_time
+                    )
+                    if 400 <= status_resp.status_code < 500:
+                        # Повтор не поможет: задача не найдена или нет доступа
+                        st.error(f"Не удалось получить статус задачи: {status_resp.status_code}")
+                        break
+                    try:
+                        if status_resp.status_code != 200:
+                            raise ValueError(f"status_code={status_resp.status_code}")
+                        status = status_resp.json()
+                        logger.info(f"Статус задачи: {status}")
+                    except Exception as e:
+                        logger.warning("Ошибка при получении статуса задачи", exc_info=True)
+                        status = {}
+                        # Пауза перед повтором, чтобы не засыпать API запросами
+                        time.sleep(1)
 
                 if status.get("result"):
                     ids = json.loads(status["result"])
@@ -202,12 +219,16 @@ def load_top_items(query=None):
                         logger.info(f"Загружено товаров: {len(st.session_state.top_items)}")
                     break
 
+                if status.get("status") == "failed":
+                    logger.warning("Задача завершилась с ошибкой.")
+                    st.error("Не удалось получить рекомендации.")
+                    break
+
                 if time.time() - start_time > max_wait_time:
                     logger.warning("Время ожидания результата истекло.")
+                    st.warning("Время ожидания рекомендаций истекло.")
                     break
 
-                time.sleep(1)
-
     except Exception as e:
         logger.error("Ошибка при загрузке рекомендаций", exc_info=True)
 